@@ -0,0 +1,311 @@
+import json
+import math
+import random
+
+CENTRE = (51.5074, -0.1278)  # (latitude, longitude) of the centre of the synthetic networks, in degrees
+KM_PER_DEGREE = 111.2  # length of a degree of latitude, in km
+STATION_SPACING = 1.0  # average distance between two consecutive stations of a line, in km
+SPEED = 0.6  # speed of the trains, in km/min
+ZONES = 9  # number of zones, in rings around the centre
+
+NAME_SYLLABLES = ["ac", "al", "bar", "bel", "bow", "brent", "bur", "cam", "chal", "chig", "col", "dag", "ed", "el",
+                  "fair", "fin", "gold", "green", "ham", "har", "hen", "hol", "ick", "ken", "kil", "lam", "ley",
+                  "mar", "mor", "north", "oak", "ost", "pad", "pin", "rav", "rich", "ruis", "shep", "stan", "stock",
+                  "swiss", "tem", "tot", "up", "vaux", "wat", "wem", "west", "wim", "wood"]
+NAME_ENDINGS = ["ton", "ley", "ford", "field", "wick", "bury", "ham", "well", "worth", "stead", "den", "more"]
+NAME_SUFFIXES = ["", "", "", " Park", " Road", " Green", " Street", " Cross", " Hill", " Common", " Broadway"]
+
+
+class NetworkGenerator:
+    """ Generates synthetic tube networks, written as JSON files with the same schema as data/london.json.
+
+    Each line is a random walk across a square area centred on London, with one station every STATION_SPACING km
+    or so: the area grows with the number of stations, so that the density of stations stays the same as they are
+    added. The zones are rings around the centre (a station close to the boundary of two zones gets a "x.5" zone).
+    The time of a connection is the time needed to travel its length at SPEED.
+
+    The lines are linked together by interchanges: a station of a line is also served by another line, through an
+    extra connection to the closest station of that line nearby. Each line is linked to the lines generated before
+    it at least once, so that the network is connected; `interchange_density` is the share of the stations which
+    get an interchange on top of that.
+
+    To find the nearby stations quickly, the stations are bucketed in a grid of square cells.
+    """
+
+    def __init__(self, stations, lines=None, interchange_density=0.1, seed=0):
+        """
+        Args:
+            stations (int) : number of stations
+            lines (int) : number of lines, defaults to one line per 25 stations (as in data/london.json)
+            interchange_density (float) : share of the stations which get an interchange with another line
+            seed (int) : seed of the random generator, the same parameters always give the same network
+        """
+        assert stations >= 2, "A network needs at least two stations"
+
+        self.n_stations = stations
+        self.n_lines = max(1, min(stations // 2, stations // 25 if lines is None else lines))
+        self.interchange_density = interchange_density
+        self.random = random.Random(seed)
+
+        self.side = math.sqrt(stations) * STATION_SPACING  # length of a side of the area, in km
+        self.cell_size = 2 * STATION_SPACING
+        self.grid = {}  # key: (column, row) of a cell, value: numbers of the stations in the cell
+
+        self.positions = []  # (x, y) of each station, in km from the centre
+        self.station_lines = []  # number of the line of each station
+        self.connections = []  # (station number, station number, line number, time)
+
+    def generate(self):
+        """ Generates the stations, the lines and the connections of the network """
+
+        stations_per_line = [self.n_stations // self.n_lines + (line < self.n_stations % self.n_lines)
+                             for line in range(self.n_lines)]
+
+        for line, n_stations in enumerate(stations_per_line):
+            first_station = len(self.positions)
+            self.add_line_stations(line, n_stations)
+            for station in range(first_station + 1, len(self.positions)):
+                self.add_connection(station - 1, station, line)
+
+            if line > 0:
+                self.link_line(line, first_station, len(self.positions))
+
+        for station in range(self.n_stations):
+            if self.random.random() < self.interchange_density:
+                self.add_interchange(station, lambda line: line != self.station_lines[station])
+
+    def add_line_stations(self, line, n_stations):
+        """ Adds the stations of a line along a random walk, bouncing on the sides of the area
+
+        Args:
+            line (int) : number of the line
+            n_stations (int) : number of stations of the line
+        """
+
+        half_side = self.side / 2
+        x, y = self.random.uniform(-half_side, half_side), self.random.uniform(-half_side, half_side)
+        heading = self.random.uniform(0, 2 * math.pi)
+
+        for _ in range(n_stations):
+            station = len(self.positions)
+            self.positions.append((x, y))
+            self.station_lines.append(line)
+            self.grid.setdefault(self.get_cell(x, y), []).append(station)
+
+            heading += self.random.gauss(0, 0.3)
+            step = self.random.uniform(0.5, 1.5) * STATION_SPACING
+            x, y = x + step * math.cos(heading), y + step * math.sin(heading)
+            if abs(x) > half_side:
+                x = math.copysign(2 * half_side - abs(x), x)
+                heading = math.pi - heading
+            if abs(y) > half_side:
+                y = math.copysign(2 * half_side - abs(y), y)
+                heading = -heading
+
+    def link_line(self, line, first_station, end_station):
+        """ Adds an interchange between a line and one of the lines generated before it
+
+        The first station of the line with a station of an earlier line nearby gets the interchange; if there is
+        none, the closest station of an earlier line among a random sample is used.
+
+        Args:
+            line (int) : number of the line
+            first_station (int) : number of the first station of the line
+            end_station (int) : number of the last station of the line, plus one
+        """
+
+        for station in range(first_station, end_station):
+            if self.add_interchange(station, lambda other_line: other_line < line):
+                return
+
+        station = self.random.randrange(first_station, end_station)
+        candidates = [self.random.randrange(0, first_station) for _ in range(64)]
+        other_station = min(candidates, key=lambda candidate: self.get_distance(station, candidate))
+        self.add_connection(station, other_station, self.station_lines[other_station])
+
+    def add_interchange(self, station, is_allowed):
+        """ Connects a station to the closest station nearby of another line, on that line
+
+        Args:
+            station (int) : number of the station
+            is_allowed (function) : tells whether a line number can be used for the interchange
+
+        Returns:
+            added (bool) : False if there is no station of an allowed line nearby
+        """
+
+        column, row = self.get_cell(*self.positions[station])
+
+        closest_station = None
+        closest_distance = math.inf
+        for neighbour_column in (column - 1, column, column + 1):
+            for neighbour_row in (row - 1, row, row + 1):
+                for other_station in self.grid.get((neighbour_column, neighbour_row), ()):
+                    if not is_allowed(self.station_lines[other_station]):
+                        continue
+                    distance = self.get_distance(station, other_station)
+                    if distance < closest_distance:
+                        closest_station, closest_distance = other_station, distance
+
+        if closest_station is None:
+            return False
+
+        self.add_connection(station, closest_station, self.station_lines[closest_station])
+        return True
+
+    def add_connection(self, station_a, station_b, line):
+        """ Adds a connection between two stations, its time being based on their distance
+
+        Args:
+            station_a (int) : number of the first station
+            station_b (int) : number of the second station
+            line (int) : number of the line
+        """
+
+        time = max(1, round(self.get_distance(station_a, station_b) / SPEED))
+        self.connections.append((station_a, station_b, line, time))
+
+    def get_distance(self, station_a, station_b):
+        """ Computes the distance between two stations, in km """
+        (x_a, y_a), (x_b, y_b) = self.positions[station_a], self.positions[station_b]
+        return math.hypot(x_a - x_b, y_a - y_b)
+
+    def get_cell(self, x, y):
+        """ Returns the (column, row) of the cell of the grid containing a position """
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def get_zone(self, station):
+        """ Computes the zone of a station from its distance to the centre, as written in the JSON file
+
+        Args:
+            station (int) : number of the station
+
+        Returns:
+            zone (str) : zone number, or "x.5" for a station on the boundary of the zones x and x + 1
+        """
+
+        x, y = self.positions[station]
+        ring = math.hypot(x, y) / (self.side / 2) * ZONES
+        zone = min(ZONES, int(ring) + 1)
+
+        if zone < ZONES and ring - int(ring) > 0.95:
+            return f"{zone}.5"
+        return str(zone)
+
+    def get_names(self):
+        """ Generates a distinct, pronounceable name for each station
+
+        Returns:
+            names (list) : name of each station
+        """
+
+        names = []
+        used_names = set()
+        for _ in range(self.n_stations):
+            word = "".join(self.random.choice(NAME_SYLLABLES) for _ in range(self.random.randint(1, 2)))
+            name = (word + self.random.choice(NAME_ENDINGS)).capitalize() + self.random.choice(NAME_SUFFIXES)
+
+            unique_name = name
+            number = 2
+            while unique_name in used_names:
+                unique_name = f"{name} {number}"
+                number += 1
+            used_names.add(unique_name)
+            names.append(unique_name)
+
+        return names
+
+    def write(self, filepath):
+        """ Writes the network to a JSON file with the schema of data/london.json, one record at a time
+
+        Args:
+            filepath (str) : path of the JSON file to write
+        """
+
+        names = self.get_names()
+        longitude_km = KM_PER_DEGREE * math.cos(math.radians(CENTRE[0]))
+
+        # Lines serving each station besides its own one, through interchanges
+        other_lines = {}
+        for station_a, station_b, line, time in self.connections:
+            for station in (station_a, station_b):
+                if line != self.station_lines[station]:
+                    other_lines.setdefault(station, set()).add(line)
+
+        def stations():
+            for station, (x, y) in enumerate(self.positions):
+                lines = {self.station_lines[station]} | other_lines.get(station, set())
+                yield {"id": str(station + 1),
+                       "latitude": f"{CENTRE[0] + y / KM_PER_DEGREE:.4f}",
+                       "longitude": f"{CENTRE[1] + x / longitude_km:.4f}",
+                       "name": names[station], "display_name": "NULL", "zone": self.get_zone(station),
+                       "total_lines": str(len(lines)), "rail": "0"}
+
+        def lines():
+            for line in range(self.n_lines):
+                yield {"line": str(line + 1), "name": f"Line {line + 1}",
+                       "colour": f"{self.random.randrange(1 << 24):06X}", "stripe": "NULL"}
+
+        def connections():
+            for station_a, station_b, line, time in self.connections:
+                yield {"station1": str(station_a + 1), "station2": str(station_b + 1), "line": str(line + 1),
+                       "time": str(time)}
+
+        # Same order of the sections as data/london.json
+        with open(filepath, "w") as jsonfile:
+            jsonfile.write("{")
+            for position, (section, records) in enumerate((("connections", connections()), ("lines", lines()),
+                                                           ("stations", stations()))):
+                jsonfile.write(f'{", " if position > 0 else ""}"{section}": [')
+                for index, record in enumerate(records):
+                    if index > 0:
+                        jsonfile.write(", ")
+                    jsonfile.write(json.dumps(record))
+                jsonfile.write("]")
+            jsonfile.write("}")
+
+
+def generate_network(filepath, stations, lines=None, interchange_density=0.1, seed=0):
+    """ Generates a synthetic network and writes it to a JSON file (see NetworkGenerator)
+
+    Args:
+        filepath (str) : path of the JSON file to write
+        stations (int) : number of stations
+        lines (int) : number of lines, defaults to one line per 25 stations
+        interchange_density (float) : share of the stations which get an interchange with another line
+        seed (int) : seed of the random generator
+    """
+
+    generator = NetworkGenerator(stations, lines, interchange_density, seed)
+    generator.generate()
+    generator.write(filepath)
+
+
+def test_generator():
+    import os
+    import tempfile
+    from network.path import PathFinder
+    from tube.map import TubeMap
+
+    filepath = os.path.join(tempfile.mkdtemp(), "synthetic.json")
+    generate_network(filepath, 1000, lines=20, interchange_density=0.2)
+
+    tubemap = TubeMap()
+    tubemap.import_from_json(filepath)
+    assert len(tubemap.stations) == 1000 and len(tubemap.lines) == 20
+    assert len(tubemap.connections) >= 1000 - 20
+
+    # The network is connected
+    path_finder = PathFinder(tubemap)
+    distances, previous_station = path_finder.get_shortest_path_tree("1")
+    assert len(distances) == 1000
+
+    # The same parameters always give the same file
+    other_filepath = os.path.join(os.path.dirname(filepath), "other.json")
+    generate_network(other_filepath, 1000, lines=20, interchange_density=0.2)
+    with open(filepath) as jsonfile, open(other_filepath) as other_jsonfile:
+        assert jsonfile.read() == other_jsonfile.read()
+
+
+if __name__ == "__main__":
+    test_generator()
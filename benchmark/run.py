@@ -0,0 +1,297 @@
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+from benchmark.generator import generate_network
+from network.graph import NeighbourGraphBuilder, graph_cache
+from network.path import PathFinder
+from tube.map import TubeMap
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+SHORT_TRIP_HOPS = 5  # number of connections of the short trips
+
+
+def measure(function):
+    """ Times a function call, and measures the peak memory allocated during a second call
+
+    The peak memory is measured with tracemalloc, which slows the allocations down: it is measured on its own call,
+    so that it does not distort the time.
+
+    Args:
+        function (function) : function to measure, without arguments
+
+    Returns:
+        measurement (tuple) : (result of the first call, time in seconds, peak memory in MB)
+    """
+
+    gc.collect()
+    started = time.perf_counter()
+    result = function()
+    elapsed_time = time.perf_counter() - started
+
+    gc.collect()
+    tracemalloc.start()
+    function()
+    peak_memory = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+
+    return result, elapsed_time, peak_memory
+
+
+def get_trips(tubemap, graph, queries, seed):
+    """ Picks random short and long trips
+
+    A short trip follows SHORT_TRIP_HOPS random connections from a random station. A long trip goes from a random
+    station to the farthest station (as the crow flies) of a random sample.
+
+    Args:
+        tubemap (TubeMap) : tube map to pick the stations from
+        graph (dict) : graph of the TubeMap
+        queries (int) : number of trips of each kind
+        seed (int) : seed of the random generator
+
+    Returns:
+        trips (dict) : "short" and "long": lists of (start station name, end station name)
+    """
+
+    generator = random.Random(seed)
+    station_ids = list(tubemap.stations)
+    coordinates = tubemap.coordinates
+
+    def get_name(station):
+        return tubemap.stations[station].name
+
+    def get_distance(station_a, station_b):
+        (latitude_a, longitude_a), (latitude_b, longitude_b) = coordinates[station_a], coordinates[station_b]
+        return (latitude_a - latitude_b) ** 2 + (longitude_a - longitude_b) ** 2
+
+    trips = {"short": [], "long": []}
+    for _ in range(queries):
+        start = generator.choice(station_ids)
+        end = start
+        for _ in range(SHORT_TRIP_HOPS):
+            if len(graph[end]) > 0:
+                end = generator.choice(list(graph[end]))
+        trips["short"].append((get_name(start), get_name(end)))
+
+        start = generator.choice(station_ids)
+        end = max(generator.sample(station_ids, min(32, len(station_ids))),
+                  key=lambda station: get_distance(start, station))
+        trips["long"].append((get_name(start), get_name(end)))
+
+    return trips
+
+
+def time_queries(path_finder, trips):
+    """ Times shortest path queries
+
+    Args:
+        path_finder (PathFinder) : PathFinder answering the queries
+        trips (list) : (start station name, end station name) of each query
+
+    Returns:
+        times (dict) : median, mean and maximum time of a query, in ms
+    """
+
+    times = []
+    for start_station_name, end_station_name in trips:
+        started = time.perf_counter()
+        path_finder.get_shortest_path(start_station_name, end_station_name)
+        times.append((time.perf_counter() - started) * 1000)
+
+    return {"median_ms": statistics.median(times), "mean_ms": statistics.mean(times), "max_ms": max(times)}
+
+
+def run_benchmark(filepath, queries, seed):
+    """ Times the import of a network, the building of its graph and shortest path queries
+
+    The cold queries are the first query of a PathFinder whose graph has not been built yet (so they include the
+    building of the graph by the graph cache); the warm queries reuse the graph.
+
+    Args:
+        filepath (str) : path to the JSON file describing the network
+        queries (int) : number of queries of each kind
+        seed (int) : seed of the random generator picking the queries
+
+    Returns:
+        result (dict) : size of the network and measurements
+    """
+
+    def import_tubemap():
+        tubemap = TubeMap()
+        tubemap.import_from_json(filepath)
+        return tubemap
+
+    tubemap, import_time, import_memory = measure(import_tubemap)
+    graph, build_time, build_memory = measure(lambda: NeighbourGraphBuilder().build(tubemap))
+
+    trips = get_trips(tubemap, graph, queries, seed)
+
+    cold_times = []
+    for start_station_name, end_station_name in trips["long"][:max(1, queries // 10)]:
+        graph_cache.invalidate(tubemap)
+        path_finder = PathFinder(tubemap)
+        started = time.perf_counter()
+        path_finder.get_shortest_path(start_station_name, end_station_name)
+        cold_times.append((time.perf_counter() - started) * 1000)
+
+    path_finder = PathFinder(tubemap)
+    path_finder.graph  # builds the graph before the warm queries
+
+    return {
+        "stations": len(tubemap.stations),
+        "lines": len(tubemap.lines),
+        "connections": len(tubemap.connections),
+        "file_size_mb": os.path.getsize(filepath) / 1e6,
+        "import": {"time_s": import_time, "peak_memory_mb": import_memory},
+        "build": {"time_s": build_time, "peak_memory_mb": build_memory},
+        "query": {
+            "cold_long": {"median_ms": statistics.median(cold_times), "mean_ms": statistics.mean(cold_times),
+                          "max_ms": max(cold_times)},
+            "warm_short": time_queries(path_finder, trips["short"]),
+            "warm_long": time_queries(path_finder, trips["long"]),
+        },
+    }
+
+
+def get_git_commit():
+    """ Returns the current git commit of the repository, None if it is unknown """
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(results, previous_results, threshold=1.2):
+    """ Prints the measurements which got slower or bigger than in previous results
+
+    Args:
+        results (dict) : results of run_benchmarks
+        previous_results (dict) : results of a previous run, for instance of another version
+        threshold (float) : ratio (current / previous) above which a measurement is reported as a regression
+
+    Returns:
+        regressions (list) : (number of stations, measurement, ratio) of each regression
+    """
+
+    previous_networks = {network["stations"]: network for network in previous_results["networks"]}
+
+    regressions = []
+    for network in results["networks"]:
+        previous_network = previous_networks.get(network["stations"])
+        if previous_network is None:
+            continue
+
+        measurements = [(f"{step}.{key}", network[step][key], previous_network[step][key])
+                        for step in ("import", "build") for key in ("time_s", "peak_memory_mb")]
+        measurements += [(f"query.{kind}.median_ms", network["query"][kind]["median_ms"],
+                          previous_network["query"][kind]["median_ms"]) for kind in network["query"]]
+
+        for name, value, previous_value in measurements:
+            ratio = value / previous_value if previous_value > 0 else 1
+            if ratio > threshold:
+                regressions.append((network["stations"], name, ratio))
+                print(f"REGRESSION {network['stations']} stations, {name}: {previous_value:.3f} -> {value:.3f} "
+                      f"(x{ratio:.2f})")
+
+    return regressions
+
+
+def run_benchmarks(sizes, lines=None, interchange_density=0.1, queries=100, seed=0, data_dir=None):
+    """ Generates a synthetic network of each size and benchmarks it (see run_benchmark)
+
+    Args:
+        sizes (list) : numbers of stations of the networks
+        lines (int) : number of lines of the networks, defaults to one line per 25 stations
+        interchange_density (float) : share of the stations which get an interchange with another line
+        queries (int) : number of queries of each kind
+        seed (int) : seed of the random generators
+        data_dir (str) : directory the networks are written to (and kept in), defaults to a temporary directory
+
+    Returns:
+        results (dict) : parameters, environment and results for each network, JSON serialisable
+    """
+
+    if data_dir is None:
+        data_dir = tempfile.mkdtemp()
+
+    networks = []
+    for size in sizes:
+        filepath = os.path.join(data_dir, f"synthetic_{size}_{lines or 'auto'}_{interchange_density}_{seed}.json")
+        if not os.path.exists(filepath):
+            generate_network(filepath, size, lines, interchange_density, seed)
+
+        result = run_benchmark(filepath, queries, seed)
+        networks.append(result)
+
+        query = result["query"]
+        print(f"{result['stations']} stations: import {result['import']['time_s']:.3f} s "
+              f"({result['import']['peak_memory_mb']:.1f} MB), build {result['build']['time_s']:.3f} s "
+              f"({result['build']['peak_memory_mb']:.1f} MB), queries (median): "
+              f"cold long {query['cold_long']['median_ms']:.2f} ms, warm short {query['warm_short']['median_ms']:.2f} "
+              f"ms, warm long {query['warm_long']['median_ms']:.2f} ms")
+
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "git_commit": get_git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {"lines": lines, "interchange_density": interchange_density, "queries": queries, "seed": seed},
+        "networks": networks,
+    }
+
+
+def test_benchmark():
+    results = run_benchmarks([1000], queries=10)
+
+    network = results["networks"][0]
+    assert network["stations"] == 1000
+    assert network["import"]["time_s"] > 0 and network["build"]["peak_memory_mb"] > 0
+    assert set(network["query"]) == {"cold_long", "warm_short", "warm_long"}
+    assert compare_results(results, results) == []
+    json.dumps(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the import, graph building and shortest path queries "
+                                                 "on synthetic networks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="numbers of stations")
+    parser.add_argument("--lines", type=int, help="number of lines (default: one line per 25 stations)")
+    parser.add_argument("--interchange-density", type=float, default=0.1,
+                        help="share of the stations with an interchange")
+    parser.add_argument("--queries", type=int, default=100, help="number of queries of each kind")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", help="directory to keep the generated networks in (reused between runs)")
+    parser.add_argument("--output", help="path of the JSON file to write the results to")
+    parser.add_argument("--compare", help="path of the JSON results of a previous run to compare with")
+    parser.add_argument("--test", action="store_true", help="run the self-test and exit")
+    arguments = parser.parse_args()
+
+    if arguments.test:
+        test_benchmark()
+        return
+
+    results = run_benchmarks(arguments.sizes, arguments.lines, arguments.interchange_density, arguments.queries,
+                             arguments.seed, arguments.data_dir)
+
+    if arguments.output is not None:
+        with open(arguments.output, "w") as outputfile:
+            json.dump(results, outputfile, indent=2)
+
+    if arguments.compare is not None:
+        with open(arguments.compare, "r") as comparefile:
+            compare_results(results, json.load(comparefile))
+
+
+if __name__ == "__main__":
+    main()
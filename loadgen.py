@@ -0,0 +1,144 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from urllib.parse import urlencode
+
+
+def get_station_names(filepath):
+    """ Reads the names of the stations of a tube map JSON file
+
+    Args:
+        filepath (str) : path to the JSON file describing the tube map
+
+    Returns:
+        names (list) : sorted names of the stations
+    """
+
+    with open(filepath, "r") as jsonfile:
+        data = json.load(jsonfile)
+
+    return sorted({station["name"] for station in data["stations"]})
+
+
+def get_percentile(sorted_values, percentile):
+    """ Computes a percentile of sorted values (nearest-rank method)
+
+    Args:
+        sorted_values (list) : values sorted in increasing order
+        percentile (float) : percentile wanted, between 0 and 100
+
+    Returns:
+        value : the percentile of the values
+    """
+
+    rank = max(1, round(percentile / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+async def run_client(host, port, targets, latencies, statuses):
+    """ Sends requests one after another on one keep-alive connection, recording their latencies
+
+    Args:
+        host (str) : address of the service
+        port (int) : port of the service
+        targets (list) : path and query string of each request
+        latencies (list) : latency (in seconds) of each request, appended to
+        statuses (dict) : key: HTTP status code, value: number of responses with this status, updated
+    """
+
+    reader, writer = await asyncio.open_connection(host, port)
+
+    for target in targets:
+        start_time = time.perf_counter()
+        writer.write(f"GET {target} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode("latin-1"))
+        await writer.drain()
+
+        status = int((await reader.readline()).split()[1])
+        content_length = 0
+        while True:
+            header_line = await reader.readline()
+            if header_line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = header_line.decode("latin-1").partition(":")
+            if name.strip().lower() == "content-length":
+                content_length = int(value)
+        await reader.readexactly(content_length)
+
+        latencies.append(time.perf_counter() - start_time)
+        statuses[status] = statuses.get(status, 0) + 1
+
+    writer.close()
+
+
+async def generate_load(host, port, station_names, requests, concurrency, origins, seed):
+    """ Sends journey queries between random stations from several concurrent clients
+
+    Args:
+        host (str) : address of the service
+        port (int) : port of the service
+        station_names (list) : names of the stations to pick the queries from
+        requests (int) : total number of requests
+        concurrency (int) : number of concurrent clients (one connection each)
+        origins (int) : number of distinct starting stations (a small number gives many queries sharing an origin)
+        seed (int) : seed of the random queries
+
+    Returns:
+        results (dict) : number of requests, statuses, duration, throughput and latency percentiles (in ms)
+    """
+
+    generator = random.Random(seed)
+    origin_names = generator.sample(station_names, min(origins, len(station_names)))
+    targets = [f"/journey?{urlencode({'from': generator.choice(origin_names), 'to': generator.choice(station_names)})}"
+               for _ in range(requests)]
+
+    latencies = []
+    statuses = {}
+    start_time = time.perf_counter()
+    await asyncio.gather(*[run_client(host, port, targets[client::concurrency], latencies, statuses)
+                           for client in range(concurrency)])
+    elapsed_time = time.perf_counter() - start_time
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "statuses": statuses,
+        "duration_s": elapsed_time,
+        "throughput_rps": len(latencies) / elapsed_time,
+        "latency_ms": {"p50": 1000 * get_percentile(latencies, 50),
+                       "p90": 1000 * get_percentile(latencies, 90),
+                       "p99": 1000 * get_percentile(latencies, 99),
+                       "max": 1000 * latencies[-1]},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator for the journey planning service (see service.py)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--requests", type=int, default=2000, help="total number of requests")
+    parser.add_argument("--concurrency", type=int, default=32, help="number of concurrent connections")
+    parser.add_argument("--origins", type=int, default=20, help="number of distinct starting stations")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data", default="data/london.json", help="tube map the station names are read from")
+    parser.add_argument("--output", help="path of a JSON file to write the results to")
+    arguments = parser.parse_args()
+
+    results = asyncio.run(generate_load(arguments.host, arguments.port, get_station_names(arguments.data),
+                                        arguments.requests, arguments.concurrency, arguments.origins, arguments.seed))
+
+    latency = results["latency_ms"]
+    print(f"{results['requests']} requests in {results['duration_s']:.2f} s "
+          f"({results['throughput_rps']:.0f} requests/s), statuses: {results['statuses']}")
+    print(f"latency: p50 {latency['p50']:.2f} ms, p90 {latency['p90']:.2f} ms, p99 {latency['p99']:.2f} ms, "
+          f"max {latency['max']:.2f} ms")
+
+    if arguments.output is not None:
+        with open(arguments.output, "w") as outputfile:
+            json.dump(results, outputfile, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,7 +11,8 @@ def get_tubemap():
     tubemap = TubeMap()
 
     try:
-        tubemap.import_from_json("data/london.json")
+        # The binary snapshot is (re)written whenever it is missing or older than the JSON file
+        tubemap.import_with_snapshot("data/london.json", "data/london.tubemap")
     except NameError:
         tubemap.validity = False
         return None
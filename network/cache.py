@@ -0,0 +1,149 @@
+from collections import OrderedDict
+
+
+class PathCache:
+    """ Bounded least-recently-used cache of shortest paths, used by PathFinder.get_shortest_path.
+
+    The paths are keyed by the IDs of their two stations, smallest ID first: the graph is undirected, so the path
+    from B to A is the path from A to B reversed, and both queries share one entry.
+
+    The cache is stamped with the `version` of the TubeMap its paths were computed for, and is emptied as soon as
+    it is used with another version. When a connection is closed or delayed through the PathFinder, only the paths
+    going through it are dropped instead (see PathFinder.edit_connection).
+
+    The cache keeps count of its hits, misses, evictions (entries dropped to make room for new ones) and
+    invalidations (entries dropped because the TubeMap changed), see `get_statistics`.
+    """
+
+    def __init__(self, max_size):
+        """
+        Args:
+            max_size (int) : maximum number of paths kept in the cache
+        """
+        assert max_size > 0, "The size of the cache must be positive"
+
+        self.max_size = max_size
+        self.paths = OrderedDict()  # key: (station ID, station ID), value: tuple of station IDs, oldest use first
+        self.version = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, start_station, end_station, version):
+        """ Looks a path up in the cache
+
+        Args:
+            start_station (str) : ID of the starting station
+            end_station (str) : ID of the ending station
+            version (int) : current version of the TubeMap
+
+        Returns:
+            path (list) : IDs of the stations of the path from the start station to the end station,
+                None if it is not in the cache
+        """
+
+        self.check_version(version)
+
+        key = (min(start_station, end_station), max(start_station, end_station))
+        path = self.paths.get(key)
+        if path is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.paths.move_to_end(key)
+
+        if path[0] == start_station:
+            return list(path)
+        return list(reversed(path))
+
+    def put(self, path, version):
+        """ Adds a path to the cache, evicting the least recently used one if the cache is full
+
+        Args:
+            path (list) : IDs of the stations of the path
+            version (int) : version of the TubeMap the path was computed for
+        """
+
+        self.check_version(version)
+
+        start_station, end_station = path[0], path[-1]
+        key = (min(start_station, end_station), max(start_station, end_station))
+        self.paths[key] = tuple(path) if start_station == key[0] else tuple(reversed(path))
+        self.paths.move_to_end(key)
+
+        while len(self.paths) > self.max_size:
+            self.paths.popitem(last=False)
+            self.evictions += 1
+
+    def check_version(self, version):
+        """ Empties the cache if the TubeMap has changed since the paths were computed
+
+        Args:
+            version (int) : current version of the TubeMap
+        """
+
+        if version != self.version:
+            self.invalidations += len(self.paths)
+            self.paths.clear()
+            self.version = version
+
+    def invalidate_stations_pair(self, station_a, station_b):
+        """ Drops the paths going directly from one station to the other (in either direction)
+
+        Args:
+            station_a (str) : ID of the first station
+            station_b (str) : ID of the second station
+        """
+
+        for key in list(self.paths):
+            path = self.paths[key]
+            for position in range(len(path) - 1):
+                if {path[position], path[position + 1]} == {station_a, station_b}:
+                    del self.paths[key]
+                    self.invalidations += 1
+                    break
+
+    def clear(self):
+        """ Empties the cache (the statistics are kept) """
+        self.invalidations += len(self.paths)
+        self.paths.clear()
+
+    def get_statistics(self):
+        """ Returns the statistics of the cache
+
+        Returns:
+            statistics (dict) : number of hits, misses, evictions and invalidations, current size and maximum size
+        """
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "size": len(self.paths),
+            "max_size": self.max_size,
+        }
+
+
+def test_cache():
+    from network.path import PathFinder
+    from tube.map import TubeMap
+    tubemap = TubeMap()
+    tubemap.import_from_json("data/london.json")
+
+    path_finder = PathFinder(tubemap, cache_size=1)
+    stations = path_finder.get_shortest_path("Covent Garden", "Green Park")
+    reversed_stations = path_finder.get_shortest_path("Green Park", "Covent Garden")
+    assert reversed_stations == list(reversed(stations))
+
+    path_finder.get_shortest_path("Stockwell", "South Kensington")
+
+    statistics = path_finder.path_cache.get_statistics()
+    assert (statistics["hits"], statistics["misses"], statistics["evictions"]) == (1, 2, 1)
+
+
+if __name__ == "__main__":
+    test_cache()
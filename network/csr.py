@@ -0,0 +1,475 @@
+from array import array
+import hashlib
+import heapq
+import math
+import mmap
+import os
+import struct
+import sys
+
+
+GRAPH_FILE_MAGIC = b"CSRG"
+GRAPH_FILE_VERSION = 2
+# magic, version, stations, lines, connections entries, strings size, fingerprint of the graph (see get_fingerprint)
+GRAPH_FILE_HEADER = struct.Struct("<4sHIIIQ32s")
+
+
+class CSRGraph:
+    """ Compact, array-backed version of the graph built by NeighbourGraphBuilder.
+
+    The stations are numbered from 0 to n - 1 (in the order of `station_ids`) and the lines from 0 to l - 1
+    (in the order of `line_ids`). The connections are stored in compressed sparse row (CSR) format, in flat
+    arrays of 32 bits integers:
+    - offsets (n + 1 items): the connections of station i are the items offsets[i] to offsets[i + 1] - 1
+      of the three arrays below
+    - targets: number of the neighbouring station reached by each connection
+    - weights: time (in minutes) of each connection
+    - lines: number of the line of each connection
+
+    Every Connection appears twice, once from each of its stations. Compared with the nested dicts of Connection
+    objects, this takes 12 bytes per connection and direction, and the search loop only reads integers laid out
+    next to each other.
+
+    The graph can be saved to a read-only file and loaded back with `load`, which maps the file in memory: the
+    arrays are then memoryviews of the file, and every process loading the same file shares one physical copy of
+    them through the page cache.
+    """
+
+    def __init__(self, station_ids, line_ids, offsets, targets, weights, lines):
+        """
+        Args:
+            station_ids (list) : IDs (str) of the stations, indexed by their number
+            line_ids (list) : IDs (str) of the lines, indexed by their number
+            offsets (array) : start of the connections of each station in the arrays below
+            targets (array) : number of the station reached by each connection
+            weights (array) : time of each connection
+            lines (array) : number of the line of each connection
+        """
+        self.station_ids = station_ids
+        self.station_indexes = {station: index for index, station in enumerate(station_ids)}
+        self.line_ids = line_ids
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        self.lines = lines
+        self.buffer = None  # memory map of the file the arrays are read from, if any
+        self.fingerprint = None  # fingerprint written in the file the graph is read from, if any
+
+    @classmethod
+    def build(cls, tubemap):
+        """ Builds the graph of a TubeMap in CSR format straight from its connections, without building the nested
+                dict graph of network.graph (so that a PathFinder with the "csr" backend only keeps the arrays)
+
+        The connections are laid out with a counting sort: a first pass counts the connections of each station, a
+        second one writes each connection at its place in the arrays, from both of its stations.
+
+        Args:
+            tubemap (TubeMap) : tube map whose graph should be built
+
+        Returns:
+            csr_graph (CSRGraph) : graph of the TubeMap in CSR format (empty if the TubeMap is invalid)
+        """
+
+        station_ids = list(tubemap.stations) if tubemap.validity else []
+        station_indexes = {station: index for index, station in enumerate(station_ids)}
+        line_ids = list(tubemap.lines)
+        line_indexes = {line: index for index, line in enumerate(line_ids)}
+
+        # Only the connections between two different stations are part of the graph (as in network.graph)
+        connections = [connection_obj for connection_obj in tubemap.connections
+                       if len(connection_obj.stations) == 2] if tubemap.validity else []
+
+        offsets = array("i", bytes(4 * (len(station_ids) + 1)))
+        for connection_obj in connections:
+            for station_obj in connection_obj.stations:
+                offsets[station_indexes[station_obj.id] + 1] += 1
+        for index in range(len(station_ids)):
+            offsets[index + 1] += offsets[index]
+
+        n_entries = 2 * len(connections)
+        targets = array("i", bytes(4 * n_entries))
+        weights = array("i", bytes(4 * n_entries))
+        lines = array("i", bytes(4 * n_entries))
+
+        positions = array("i", offsets[:-1])  # next free position of each station in the arrays
+        for connection_obj in connections:
+            station_a, station_b = [station_indexes[station_obj.id] for station_obj in connection_obj.stations]
+            line = line_indexes[connection_obj.line.id]
+            for station, neighbour in ((station_a, station_b), (station_b, station_a)):
+                position = positions[station]
+                targets[position] = neighbour
+                weights[position] = connection_obj.time
+                lines[position] = line
+                positions[station] = position + 1
+
+        return cls(station_ids, line_ids, offsets, targets, weights, lines)
+
+    def dijkstra_algorithm(self, start, end=None):
+        """ Dijkstra's algorithm over the CSR arrays, with a binary heap
+
+        Args:
+            start (int) : number of the starting station
+            end (int) : number of the ending station (the search stops once it is visited),
+                None to visit every reachable station
+
+        Returns:
+            tentative_distance (list) : distance of each station from the starting station (math.inf if it has not
+                been reached)
+            previous_station (list) : number of the previous station on ONE shortest path to each station
+                (-1 for the starting station and for the stations not reached)
+        """
+
+        offsets = self.offsets
+        targets = self.targets
+        weights = self.weights
+
+        n = len(self.station_ids)
+        tentative_distance = [math.inf] * n
+        previous_station = [-1] * n
+        visited_stations = [False] * n
+
+        tentative_distance[start] = 0
+        priority_queue = [(0, start)]
+
+        while len(priority_queue) > 0:
+            current_distance, current_station = heapq.heappop(priority_queue)
+            if visited_stations[current_station]:
+                continue
+            visited_stations[current_station] = True
+
+            if current_station == end:
+                break
+
+            for position in range(offsets[current_station], offsets[current_station + 1]):
+                neighbour = targets[position]
+                alt = current_distance + weights[position]
+                if alt < tentative_distance[neighbour]:
+                    tentative_distance[neighbour] = alt
+                    previous_station[neighbour] = current_station
+                    heapq.heappush(priority_queue, (alt, neighbour))
+
+        return tentative_distance, previous_station
+
+    def get_path(self, start_station, end_station):
+        """ Searches ONE shortest path between two stations
+
+        Args:
+            start_station (str) : ID of the starting station
+            end_station (str) : ID of the ending station
+
+        Returns:
+            path (list) : IDs of the stations of ONE shortest path, None if the end station cannot be reached
+        """
+
+        start = self.station_indexes[start_station]
+        end = self.station_indexes[end_station]
+
+        tentative_distance, previous_station = self.dijkstra_algorithm(start, end)
+        if tentative_distance[end] == math.inf:
+            return None
+
+        path = []
+        station = end
+        while station != -1:
+            path.append(self.station_ids[station])
+            station = previous_station[station]
+        path.reverse()
+
+        return path
+
+    def get_fingerprint(self):
+        """ Computes the fingerprint of the graph (see get_fingerprint), from its arrays
+
+        Returns:
+            fingerprint (bytes) : 32 bytes digest, the same as the one of the TubeMap the graph was built from
+        """
+
+        # Each connection is stored from both of its stations: it is only counted from the station with the
+        # smallest ID
+        entries = []
+        for station in range(len(self.station_ids)):
+            for position in range(self.offsets[station], self.offsets[station + 1]):
+                neighbour = self.targets[position]
+                if self.station_ids[station] < self.station_ids[neighbour]:
+                    entries.append((self.station_ids[station], self.station_ids[neighbour],
+                                    self.line_ids[self.lines[position]], self.weights[position]))
+
+        return get_digest(self.station_ids, entries)
+
+    def get_stations_pair_time(self, station_a, station_b):
+        """ Computes the time of the fastest connection between two stations
+
+        Args:
+            station_a (str) : ID of the first station
+            station_b (str) : ID of the second station
+
+        Returns:
+            time (int) : time of the fastest connection, math.inf if the stations are not connected
+        """
+
+        index_a = self.station_indexes.get(station_a)
+        index_b = self.station_indexes.get(station_b)
+        if index_a is None or index_b is None:
+            return math.inf
+
+        return min([self.weights[position] for position in range(self.offsets[index_a], self.offsets[index_a + 1])
+                    if self.targets[position] == index_b], default=math.inf)
+
+    def save(self, filepath):
+        """ Writes the graph to a file that can be memory-mapped by `load`
+
+        The file is made of a header (with the fingerprint of the graph), the station and line IDs (joined by null
+        characters) and the four arrays, as little-endian 32 bits integers. Every section starts at a multiple of
+        8 bytes.
+
+        Args:
+            filepath (str) : path of the file to write
+        """
+
+        strings = "\0".join(list(self.station_ids) + list(self.line_ids)).encode("utf-8")
+
+        with open(filepath, "wb") as graphfile:
+            graphfile.write(GRAPH_FILE_HEADER.pack(GRAPH_FILE_MAGIC, GRAPH_FILE_VERSION, len(self.station_ids),
+                                                   len(self.line_ids), len(self.targets), len(strings),
+                                                   self.get_fingerprint()))
+            graphfile.write(strings)
+            for section in (self.offsets, self.targets, self.weights, self.lines):
+                graphfile.write(bytes(-graphfile.tell() % 8))
+                section = array("i", section)
+                if sys.byteorder == "big":
+                    section.byteswap()
+                section.tofile(graphfile)
+
+    @classmethod
+    def load(cls, filepath):
+        """ Maps a file written by `save` in memory, without copying the arrays
+
+        Args:
+            filepath (str) : path of the file to read
+
+        Returns:
+            csr_graph (CSRGraph) : graph whose arrays are read-only views of the file
+        """
+
+        with open(filepath, "rb") as graphfile:
+            assert os.fstat(graphfile.fileno()).st_size >= GRAPH_FILE_HEADER.size, "Not a CSR graph file"
+            buffer = mmap.mmap(graphfile.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            magic, version, n_stations, n_lines, n_entries, strings_size, fingerprint = \
+                GRAPH_FILE_HEADER.unpack_from(buffer)
+            assert magic == GRAPH_FILE_MAGIC and version == GRAPH_FILE_VERSION, "Not a CSR graph file"
+
+            # The size of the file must be the one given by the numbers of stations, lines and connections
+            position = GRAPH_FILE_HEADER.size + strings_size
+            section_positions = []
+            for size in (n_stations + 1, n_entries, n_entries, n_entries):
+                position += -position % 8
+                section_positions.append(position)
+                position += 4 * size
+            assert len(buffer) == position, "The CSR graph file is truncated or corrupt"
+            assert struct.unpack_from("<i", buffer, section_positions[0] + 4 * n_stations)[0] == n_entries, \
+                "The CSR graph file is truncated or corrupt"
+
+            strings = buffer[GRAPH_FILE_HEADER.size:GRAPH_FILE_HEADER.size + strings_size].decode("utf-8")
+            strings = strings.split("\0") if n_stations + n_lines > 0 else []
+            assert len(strings) == n_stations + n_lines, "The CSR graph file is truncated or corrupt"
+        except (AssertionError, UnicodeDecodeError):
+            buffer.close()
+            raise
+
+        sections = []
+        for position, size in zip(section_positions, (n_stations + 1, n_entries, n_entries, n_entries)):
+            section = memoryview(buffer)[position:position + 4 * size].cast("i")
+            if sys.byteorder == "big":
+                section = array("i", section)
+                section.byteswap()
+            sections.append(section)
+
+        csr_graph = cls(strings[:n_stations], strings[n_stations:n_stations + n_lines], *sections)
+        csr_graph.buffer = buffer
+        csr_graph.fingerprint = fingerprint
+        return csr_graph
+
+    def close(self):
+        """ Releases the memory map of a graph loaded from a file (its arrays cannot be used anymore) """
+
+        if self.buffer is not None:
+            for section in (self.offsets, self.targets, self.weights, self.lines):
+                if isinstance(section, memoryview):
+                    section.release()
+            self.buffer.close()
+            self.buffer = None
+
+
+class PartialSearch:
+    """ Dijkstra's algorithm over a CSRGraph, stopped as soon as a given station has been visited.
+
+    It gives lower bounds of the distances to its starting station (the graph is undirected): the exact distance for
+    the stations visited, and the `radius` of the search for the other ones, since every station closer than the
+    radius has been visited. These bounds are min(exact distance, radius), which makes a consistent heuristic for an
+    A* search towards the starting station.
+    """
+
+    def __init__(self, csr_graph, start, end):
+        """ Runs the search
+
+        Args:
+            csr_graph (CSRGraph) : graph to search
+            start (int) : number of the starting station
+            end (int) : number of the station the search stops at
+        """
+        n = len(csr_graph.station_ids)
+        offsets = csr_graph.offsets
+        targets = csr_graph.targets
+        weights = csr_graph.weights
+
+        distance = [math.inf] * n  # distance of each station from the starting station (exact once visited)
+        previous_station = [-1] * n  # previous station on ONE shortest path from the starting station
+        visited_stations = [False] * n
+        priority_queue = [(0, start)]
+        distance[start] = 0
+
+        while len(priority_queue) > 0 and not visited_stations[end]:
+            current_distance, current_station = heapq.heappop(priority_queue)
+            if visited_stations[current_station]:
+                continue
+            visited_stations[current_station] = True
+
+            for position in range(offsets[current_station], offsets[current_station + 1]):
+                neighbour = targets[position]
+                alt = current_distance + weights[position]
+                if alt < distance[neighbour]:
+                    distance[neighbour] = alt
+                    previous_station[neighbour] = current_station
+                    heapq.heappush(priority_queue, (alt, neighbour))
+
+        while len(priority_queue) > 0 and visited_stations[priority_queue[0][1]]:
+            heapq.heappop(priority_queue)
+
+        self.distance = distance
+        self.previous_station = previous_station
+        self.visited_stations = visited_stations
+        # Every station closer than the radius has been visited (math.inf if all the reachable ones have been)
+        self.radius = priority_queue[0][0] if len(priority_queue) > 0 else math.inf
+
+
+def get_digest(station_ids, entries):
+    """ Computes a SHA-256 digest of stations and connections, which does not depend on their order
+
+    Args:
+        station_ids (list) : IDs of the stations
+        entries (list) : (smallest station ID, other station ID, line ID, time) of each connection
+
+    Returns:
+        digest (bytes) : 32 bytes digest
+    """
+
+    digest = hashlib.sha256("\0".join(sorted(station_ids)).encode("utf-8"))
+    for station, neighbour, line, weight in sorted(entries):
+        digest.update(f"\n{station}\0{neighbour}\0{line}\0{weight}".encode("utf-8"))
+
+    return digest.digest()
+
+
+def get_fingerprint(tubemap):
+    """ Computes the fingerprint of the graph of a TubeMap straight from its stations and connections (with their
+            lines and times), without building any graph
+
+    It is the fingerprint written in the graph files (see CSRGraph.save): a file can only be used for a TubeMap
+    with the same fingerprint.
+
+    Args:
+        tubemap (TubeMap) : tube map
+
+    Returns:
+        fingerprint (bytes) : 32 bytes digest
+    """
+
+    if not tubemap.validity:
+        return get_digest([], [])
+
+    entries = []
+    for connection_obj in tubemap.connections:
+        if len(connection_obj.stations) == 2:
+            station_a, station_b = sorted(station_obj.id for station_obj in connection_obj.stations)
+            entries.append((station_a, station_b, connection_obj.line.id, connection_obj.time))
+
+    return get_digest(list(tubemap.stations), entries)
+
+
+def test_csr():
+    import os
+    import tempfile
+    from network.graph import graph_cache
+    from network.path import PathFinder
+    from tube.map import TubeMap
+    tubemap = TubeMap()
+    tubemap.import_from_json("data/london.json")
+
+    path_finder = PathFinder(tubemap, backend="csr")
+    stations = path_finder.get_shortest_path("Covent Garden", "Green Park")
+
+    station_names = [station.name for station in stations]
+    expected = ["Covent Garden", "Leicester Square", "Piccadilly Circus",
+                "Green Park"]
+    assert station_names == expected
+
+    # The graph built from the connections gives the same durations as the nested dict graph, which a PathFinder
+    # with the "csr" backend never builds
+    assert graph_cache.entries.get(tubemap) is None
+    csr_graph = path_finder.get_csr_graph()
+    dict_path_finder = PathFinder(tubemap)
+    names = sorted(tubemap.stations_by_name)
+    for start_station_name in names[::40]:
+        durations = dict_path_finder.get_durations_from(start_station_name, names)
+        tentative_distance, previous_station = \
+            csr_graph.dijkstra_algorithm(csr_graph.station_indexes[tubemap.stations_by_name[start_station_name].id])
+        assert [tentative_distance[csr_graph.station_indexes[tubemap.stations_by_name[name].id]]
+                for name in names] == [durations[name] for name in names]
+
+    # Same query on the memory-mapped graph file
+    filepath = os.path.join(tempfile.mkdtemp(), "london.csr")
+    path_finder.get_csr_graph().save(filepath)
+    path_finder.use_graph_file(filepath)
+    stations = path_finder.get_shortest_path("Covent Garden", "Green Park")
+    assert [station.name for station in stations] == expected
+
+    # Closing the graph releases the file
+    csr_graph = CSRGraph.load(filepath)
+    offsets = csr_graph.offsets
+    csr_graph.close()
+    assert csr_graph.buffer is None
+    try:
+        offsets[0]
+        assert False, "The arrays of a closed graph should not be readable"
+    except ValueError:
+        pass
+    csr_graph.close()
+
+    # The fingerprint of the file is the one computed from the TubeMap, and truncated or foreign files are refused
+    assert CSRGraph.build(tubemap).get_fingerprint() == get_fingerprint(tubemap)
+    with open(filepath, "rb") as graphfile:
+        content = graphfile.read()
+    corrupt_filepath = os.path.join(os.path.dirname(filepath), "corrupt.csr")
+    for corrupt_content in (b"", content[:GRAPH_FILE_HEADER.size - 1], content[:len(content) // 2],
+                            content[:-4], b"XXXX" + content[4:]):
+        with open(corrupt_filepath, "wb") as graphfile:
+            graphfile.write(corrupt_content)
+        try:
+            CSRGraph.load(corrupt_filepath)
+            assert False, "A corrupt graph file should be refused"
+        except AssertionError as error:
+            assert str(error) in ("Not a CSR graph file", "The CSR graph file is truncated or corrupt")
+
+    # A graph file written before a connection changed is refused
+    path_finder.set_connection_time(tubemap.connections[0], tubemap.connections[0].time + 5)
+    try:
+        path_finder.use_graph_file(filepath)
+        assert False, "An outdated graph file should be refused"
+    except AssertionError as error:
+        assert str(error) == "The graph file does not match the TubeMap"
+
+
+if __name__ == "__main__":
+    test_csr()
@@ -1,3 +1,5 @@
+import weakref
+
 from tube.map import TubeMap
 
 
@@ -82,16 +84,12 @@ class NeighbourGraphBuilder:
             for station_obj in tubemap.stations:
                 nested_dict[station_obj] = {}
 
-            # Fill in the value with Connections object for each station
-            for station in nested_dict:
-                connections_with_station = self.get_connections_with_station(station, tubemap)
-                for connection_obj in connections_with_station:
-                    station_obj = tubemap.stations[station]
+            # Fill in the value with Connections object for each station, in a single pass over the connections:
+            # each connection is added to the dictionaries of both of its stations
+            for connection_obj in tubemap.connections:
+                for station_obj in connection_obj.stations:
                     self.add_connection_to_nested_dict(nested_dict, station_obj, connection_obj)
 
-            assert nested_dict["11"]["163"] == nested_dict["163"]["11"], "Connection between stations" \
-                                                                         " is not bidirectional"
-
         return nested_dict
 
     def get_connections_with_station(self, station, tubemap):
@@ -162,6 +160,112 @@ class NeighbourGraphBuilder:
                     nested_dict[station_a_obj.id][station_b_obj.id].append(connection_obj)
 
 
+class GraphCache:
+    """ Keeps the graph built by NeighbourGraphBuilder for each TubeMap, so that it is only built once.
+
+    A cached graph is stamped with the `version` of its TubeMap and is updated automatically when the TubeMap
+    has changed since: when the only changes are edits of connections recorded by the TubeMap (see
+    TubeMap.close_connection), they are applied to the graph in place, otherwise the graph is rebuilt.
+    When the stations or connections of a TubeMap are edited by hand (without going through the TubeMap methods),
+    the cached graph should be dropped explicitly with `invalidate`.
+    """
+
+    def __init__(self):
+        self.graph_builder = NeighbourGraphBuilder()
+        self.entries = weakref.WeakKeyDictionary()  # key: TubeMap, value: (version, graph)
+
+    def get(self, tubemap):
+        """ Returns the graph of a TubeMap, building it if it is missing or outdated
+
+        Args:
+            tubemap (TubeMap) : tube map serving as a reference for building the graph.
+
+        Returns:
+            graph (dict) : nested dictionary encoding neighbouring connections between stations
+        """
+
+        # Invalid inputs are not cached, the builder already handles them
+        if not isinstance(tubemap, TubeMap):
+            return self.graph_builder.build(tubemap)
+
+        entry = self.entries.get(tubemap)
+        if entry is not None and entry[0] != tubemap.version:
+            entry = self.apply_edits(tubemap, entry)
+        if entry is None or entry[0] != tubemap.version:
+            entry = (tubemap.version, self.graph_builder.build(tubemap))
+            self.entries[tubemap] = entry
+
+        return entry[1]
+
+    def apply_edits(self, tubemap, entry):
+        """ Applies to a cached graph the edits of connections made since it was built
+
+        Args:
+            tubemap (TubeMap) : tube map of the graph
+            entry (tuple) : (version, graph) cached for the TubeMap
+
+        Returns:
+            entry (tuple) : (version, graph) updated to the current version of the TubeMap, None if the TubeMap has
+                changed in other ways (or if too many edits were made), in which case the graph must be rebuilt
+        """
+
+        version, graph = entry
+        edits = [edit for edit in tubemap.edits if edit[0] > version]
+
+        # Every version between the cached one and the current one must be an edit of a connection
+        if len(edits) != tubemap.version - version:
+            return None
+
+        for edit_version, action, connection_obj in edits:
+            station_objs = list(connection_obj.stations)
+            if action == "close":
+                for station_a_obj in station_objs:
+                    for station_b_obj in station_objs:
+                        if station_b_obj != station_a_obj:
+                            self.remove_connection(graph, station_a_obj.id, station_b_obj.id, connection_obj)
+            elif action == "reopen":
+                for station_obj in station_objs:
+                    self.graph_builder.add_connection_to_nested_dict(graph, station_obj, connection_obj)
+            # A new time needs no update: the graph holds the Connection instances themselves
+
+        entry = (tubemap.version, graph)
+        self.entries[tubemap] = entry
+        return entry
+
+    @staticmethod
+    def remove_connection(graph, station_a, station_b, connection_obj):
+        """ Removes a connection from the list of the connections from station_a to station_b
+
+        Args:
+            graph (dict) : nested dictionary encoding neighbouring connections between stations
+            station_a (str) : ID of the first station
+            station_b (str) : ID of the second station
+            connection_obj (Connection) : connection to remove
+        """
+
+        connections = graph[station_a].get(station_b, [])
+        graph[station_a][station_b] = [other_obj for other_obj in connections if other_obj is not connection_obj]
+
+        # Stations without any connection left are not neighbours anymore
+        if len(graph[station_a][station_b]) == 0:
+            del graph[station_a][station_b]
+
+    def invalidate(self, tubemap=None):
+        """ Drops the cached graph of a TubeMap, or of every TubeMap if none is given
+
+        Args:
+            tubemap (TubeMap) : tube map whose graph should be rebuilt on next access
+        """
+
+        if tubemap is None:
+            self.entries.clear()
+        else:
+            self.entries.pop(tubemap, None)
+
+
+graph_cache = GraphCache()  # shared by all the PathFinder instances
+
+
 def test_graph():
     from tube.map import TubeMap
     tubemap = TubeMap()
@@ -0,0 +1,393 @@
+import heapq
+import math
+
+from network.graph import graph_cache
+
+WITNESS_SEARCH_LIMIT = 64  # maximum number of stations visited by each witness search
+
+
+class ContractionHierarchy:
+    """ Contraction hierarchy of the graph of a TubeMap, answering shortest path queries on large networks.
+
+    The stations are contracted one after the other, from the least to the most important one. Contracting a
+    station removes it from the graph and adds a shortcut between two of its neighbours whenever the path going
+    through the station is the only shortest path between them. Each station then gets a rank (its position in the
+    contraction order), and a query only needs to follow edges going up in rank: one bidirectional Dijkstra search
+    on the upward graph, which visits a few dozen stations even on very large networks. The shortcuts of the path
+    found are finally unpacked into the original stations.
+
+    Only the fastest connection between two neighbouring stations matters for durations, so the hierarchy is built
+    on those (the line used is not taken into account).
+    """
+
+    def __init__(self, tubemap, station_ids, upward_graph, middle_stations):
+        """
+        Args:
+            tubemap (TubeMap) : tube map the hierarchy was built for
+            station_ids (list) : IDs (str) of the stations, indexed by their number in the hierarchy
+            upward_graph (list) : for each station number, list of (neighbour number, duration) of the edges
+                (and shortcuts) towards stations of higher rank
+            middle_stations (dict) : key: (station number, station number) of a shortcut (smallest number first),
+                value: number of the contracted station the shortcut goes through
+        """
+        self.tubemap = tubemap
+        self.version = tubemap.version
+        self.station_ids = station_ids
+        self.station_indexes = {station: index for index, station in enumerate(station_ids)}
+        self.upward_graph = upward_graph
+        self.middle_stations = middle_stations
+
+    @classmethod
+    def build(cls, tubemap):
+        """ Contracts all the stations of the graph of a TubeMap
+
+        The next station to contract is the one with the smallest edge difference (shortcuts added minus edges
+        removed) plus the number of its neighbours already contracted, which keeps the hierarchy flat and the
+        number of shortcuts low. Priorities are updated lazily: a station is only contracted if its recomputed
+        priority is still the smallest one.
+
+        Args:
+            tubemap (TubeMap) : tube map whose graph (see network.graph) should be contracted
+
+        Returns:
+            hierarchy (ContractionHierarchy) : contraction hierarchy of the TubeMap
+        """
+
+        graph = graph_cache.get(tubemap)
+
+        station_ids = list(graph)
+        station_indexes = {station: index for index, station in enumerate(station_ids)}
+
+        # Remaining graph: for each station, its fastest edge to each neighbour still to be contracted
+        remaining_graph = [{} for _ in station_ids]
+        for station, neighbours in graph.items():
+            for neighbour, connections in neighbours.items():
+                time = min(connection_obj.time for connection_obj in connections)
+                remaining_graph[station_indexes[station]][station_indexes[neighbour]] = time
+
+        middle_stations = {}
+        contracted_neighbours = [0] * len(station_ids)
+        rank = [None] * len(station_ids)
+        upward_graph = [[] for _ in station_ids]
+
+        priority_queue = [(cls.get_priority(remaining_graph, contracted_neighbours, station), station)
+                          for station in range(len(station_ids))]
+        heapq.heapify(priority_queue)
+
+        current_rank = 0
+        while len(priority_queue) > 0:
+            priority, station = heapq.heappop(priority_queue)
+
+            # Lazy update: contract the station only if it is still the least important one
+            priority = cls.get_priority(remaining_graph, contracted_neighbours, station)
+            if len(priority_queue) > 0 and priority > priority_queue[0][0]:
+                heapq.heappush(priority_queue, (priority, station))
+                continue
+
+            for neighbour_a, neighbour_b, time in cls.get_shortcuts(remaining_graph, station):
+                if time < remaining_graph[neighbour_a].get(neighbour_b, math.inf):
+                    remaining_graph[neighbour_a][neighbour_b] = time
+                    remaining_graph[neighbour_b][neighbour_a] = time
+                    middle_stations[(min(neighbour_a, neighbour_b), max(neighbour_a, neighbour_b))] = station
+
+            # The remaining edges of the station all go up in rank
+            rank[station] = current_rank
+            current_rank += 1
+            for neighbour, time in remaining_graph[station].items():
+                upward_graph[station].append((neighbour, time))
+                del remaining_graph[neighbour][station]
+                contracted_neighbours[neighbour] += 1
+            remaining_graph[station] = {}
+
+        return cls(tubemap, station_ids, upward_graph, middle_stations)
+
+    @classmethod
+    def get_priority(cls, remaining_graph, contracted_neighbours, station):
+        """ Computes the importance of a station: the lower, the sooner it is contracted
+
+        Args:
+            remaining_graph (list) : for each station number, dict of its neighbours still to be contracted
+            contracted_neighbours (list) : for each station number, number of its neighbours already contracted
+            station (int) : number of the station
+
+        Returns:
+            priority (int) : edge difference of the station plus its number of contracted neighbours
+        """
+
+        shortcuts = cls.get_shortcuts(remaining_graph, station)
+        return len(shortcuts) - len(remaining_graph[station]) + contracted_neighbours[station]
+
+    @classmethod
+    def get_shortcuts(cls, remaining_graph, station):
+        """ Finds the shortcuts needed to contract a station
+
+        A shortcut is needed between two neighbours of the station unless a witness search finds a path between
+        them, avoiding the station, that is not longer than the path going through the station. The witness
+        searches are limited, so some shortcuts may be added needlessly, which does not change the results.
+
+        Args:
+            remaining_graph (list) : for each station number, dict of its neighbours still to be contracted
+            station (int) : number of the station to contract
+
+        Returns:
+            shortcuts (list) : (neighbour number, neighbour number, duration) of the shortcuts to add
+        """
+
+        neighbours = list(remaining_graph[station].items())
+        shortcuts = []
+
+        for position, (neighbour_a, time_a) in enumerate(neighbours):
+            targets = neighbours[position + 1:]
+            if len(targets) == 0:
+                continue
+
+            max_distance = time_a + max(time_b for neighbour_b, time_b in targets)
+            witness_distance = cls.witness_search(remaining_graph, neighbour_a, station, max_distance)
+
+            for neighbour_b, time_b in targets:
+                if witness_distance.get(neighbour_b, math.inf) > time_a + time_b:
+                    shortcuts.append((neighbour_a, neighbour_b, time_a + time_b))
+
+        return shortcuts
+
+    @staticmethod
+    def witness_search(remaining_graph, start_station, avoided_station, max_distance):
+        """ Runs a limited Dijkstra search in the remaining graph, avoiding the station being contracted
+
+        Args:
+            remaining_graph (list) : for each station number, dict of its neighbours still to be contracted
+            start_station (int) : number of the station the search starts from
+            avoided_station (int) : number of the station being contracted
+            max_distance (int) : the search stops beyond this distance
+
+        Returns:
+            tentative_distance (dict) : key: station number, value: distance found from the start station
+        """
+
+        tentative_distance = {start_station: 0}
+        visited_stations = set()
+        priority_queue = [(0, start_station)]
+
+        while len(priority_queue) > 0 and len(visited_stations) < WITNESS_SEARCH_LIMIT:
+            current_distance, current_station = heapq.heappop(priority_queue)
+            if current_station in visited_stations:
+                continue
+            if current_distance > max_distance:
+                break
+            visited_stations.add(current_station)
+
+            for neighbour, time in remaining_graph[current_station].items():
+                alt = current_distance + time
+                if neighbour != avoided_station and alt < tentative_distance.get(neighbour, math.inf):
+                    tentative_distance[neighbour] = alt
+                    heapq.heappush(priority_queue, (alt, neighbour))
+
+        return tentative_distance
+
+    def get_shortest_path(self, start_station_name, end_station_name):
+        """ Find ONE shortest path (in terms of duration) from start_station_name to end_station_name,
+                in the same format as PathFinder.get_shortest_path.
+
+        Args:
+            start_station_name (str): name of the starting station
+            end_station_name (str): name of the ending station
+
+        Returns:
+            path (list) : list of Station objects corresponding to ONE
+                shortest path from start_station_name to end_station_name.
+                Returns None if start_station_name or end_station_name does not exist.
+        """
+
+        assert self.version == self.tubemap.version, "The TubeMap has changed since the hierarchy was built"
+
+        start_station_obj = self.tubemap.stations_by_name.get(start_station_name)
+        end_station_obj = self.tubemap.stations_by_name.get(end_station_name)
+        if start_station_obj is None or end_station_obj is None:
+            return None
+
+        path_ids = self.get_path(start_station_obj.id, end_station_obj.id)
+        if path_ids is None:
+            return None
+
+        return [self.tubemap.stations[station] for station in path_ids]
+
+    def get_path(self, start_station, end_station):
+        """ Searches the upward graph from both stations and unpacks the shortcuts of the path found
+
+        Args:
+            start_station (str) : ID of the starting station
+            end_station (str) : ID of the ending station
+
+        Returns:
+            path (list) : IDs of the stations of ONE shortest path, None if the end station cannot be reached
+        """
+
+        start = self.station_indexes[start_station]
+        end = self.station_indexes[end_station]
+
+        # Index 0 is the search from the start station, index 1 the search from the end station
+        tentative_distance = [{start: 0}, {end: 0}]
+        previous_station = [{start: None}, {end: None}]
+        visited_stations = [set(), set()]
+        priority_queues = [[(0, start)], [(0, end)]]
+
+        best_distance = 0 if start == end else math.inf
+        meeting_station = start if start == end else None
+
+        while len(priority_queues[0]) > 0 or len(priority_queues[1]) > 0:
+
+            # Expands the side with the closest station; a side is done once its queue exceeds the best distance
+            if len(priority_queues[1]) == 0 or (len(priority_queues[0]) > 0 and
+                                                priority_queues[0][0][0] <= priority_queues[1][0][0]):
+                side = 0
+            else:
+                side = 1
+
+            current_distance, current_station = heapq.heappop(priority_queues[side])
+            if current_distance >= best_distance:
+                priority_queues[side] = []
+                continue
+            if current_station in visited_stations[side]:
+                continue
+            visited_stations[side].add(current_station)
+
+            if current_station in tentative_distance[1 - side]:
+                candidate = current_distance + tentative_distance[1 - side][current_station]
+                if candidate < best_distance:
+                    best_distance = candidate
+                    meeting_station = current_station
+
+            for neighbour, time in self.upward_graph[current_station]:
+                alt = current_distance + time
+                if alt < tentative_distance[side].get(neighbour, math.inf):
+                    tentative_distance[side][neighbour] = alt
+                    previous_station[side][neighbour] = current_station
+                    heapq.heappush(priority_queues[side], (alt, neighbour))
+
+        if meeting_station is None:
+            return None
+
+        # Path in the hierarchy: start station -> meeting station -> end station (with shortcuts)
+        hierarchy_path = []
+        station = meeting_station
+        while station is not None:
+            hierarchy_path.append(station)
+            station = previous_station[0][station]
+        hierarchy_path.reverse()
+
+        station = previous_station[1][meeting_station]
+        while station is not None:
+            hierarchy_path.append(station)
+            station = previous_station[1][station]
+
+        path = [hierarchy_path[0]]
+        for station_a, station_b in zip(hierarchy_path, hierarchy_path[1:]):
+            self.unpack(station_a, station_b, path)
+
+        return [self.station_ids[station] for station in path]
+
+    def unpack(self, station_a, station_b, path):
+        """ Appends to path the original stations between station_a (excluded) and station_b (included)
+
+        Args:
+            station_a (int) : number of the first station of the edge or shortcut
+            station_b (int) : number of the last station of the edge or shortcut
+            path (list) : path to complete
+        """
+
+        # Iterative version of the recursive unpacking, to avoid deep recursions on long shortcuts
+        stack = [(station_a, station_b)]
+        while len(stack) > 0:
+            station_a, station_b = stack.pop()
+            middle_station = self.middle_stations.get((min(station_a, station_b), max(station_a, station_b)))
+            if middle_station is None:
+                path.append(station_b)
+            else:
+                stack.append((middle_station, station_b))
+                stack.append((station_a, middle_station))
+
+
+def test_hierarchy():
+    from tube.map import TubeMap
+    tubemap = TubeMap()
+    tubemap.import_from_json("data/london.json")
+
+    hierarchy = ContractionHierarchy.build(tubemap)
+    stations = hierarchy.get_shortest_path("Covent Garden", "Green Park")
+
+    station_names = [station.name for station in stations]
+    expected = ["Covent Garden", "Leicester Square", "Piccadilly Circus",
+                "Green Park"]
+    assert station_names == expected
+
+    # Same durations as the searches of PathFinder, from a sample of starting stations
+    check_hierarchy(tubemap, hierarchy)
+
+    assert [station.name for station in hierarchy.get_shortest_path("Green Park", "Green Park")] == ["Green Park"]
+    assert hierarchy.get_shortest_path("Green Park", "Nowhere") is None
+
+    # Mill Hill East cannot be reached once its only connection is closed
+    connection = next(connection for connection in tubemap.connections
+                      if "Mill Hill East" in {station.name for station in connection.stations})
+    tubemap.close_connection(connection)
+    hierarchy = ContractionHierarchy.build(tubemap)
+    assert hierarchy.get_shortest_path("Mill Hill East", "Green Park") is None
+    assert hierarchy.get_shortest_path("Green Park", "Mill Hill East") is None
+    assert [station.name for station in hierarchy.get_shortest_path("Mill Hill East", "Mill Hill East")] == \
+        ["Mill Hill East"]
+    check_hierarchy(tubemap, hierarchy)
+
+
+def check_hierarchy(tubemap, hierarchy):
+    from network.path import PathFinder
+    path_finder = PathFinder(tubemap)
+    names = sorted(tubemap.stations_by_name)
+    for start_station_name in names[::30] + ["Mill Hill East"]:
+        durations = path_finder.get_durations_from(start_station_name, names)
+        for end_station_name in names:
+            stations = hierarchy.get_shortest_path(start_station_name, end_station_name)
+            if durations[end_station_name] is None:
+                assert stations is None, (start_station_name, end_station_name)
+                continue
+            assert stations[0].name == start_station_name and stations[-1].name == end_station_name
+            duration = sum(path_finder.get_stations_pair_time(station_a.id, station_b.id)
+                           for station_a, station_b in zip(stations, stations[1:]))
+            assert duration == durations[end_station_name], (start_station_name, end_station_name)
+
+
+def benchmark_hierarchy(queries=2000):
+    """ Compares the contraction hierarchy with PathFinder (build time and query time) on the London network """
+    import random
+    import time
+    from network.path import PathFinder
+    from tube.map import TubeMap
+    tubemap = TubeMap()
+    tubemap.import_from_json("data/london.json")
+
+    path_finder = PathFinder(tubemap)
+    path_finder.graph  # builds the graph before timing the preprocessing
+
+    started = time.perf_counter()
+    hierarchy = ContractionHierarchy.build(tubemap)
+    build_time = time.perf_counter() - started
+    shortcuts = len(hierarchy.middle_stations)
+    print(f"Contraction hierarchy built in {build_time * 1000:.1f} ms ({shortcuts} shortcuts)")
+
+    names = sorted(tubemap.stations_by_name)
+    random.seed(0)
+    pairs = [(random.choice(names), random.choice(names)) for _ in range(queries)]
+
+    for label, query in (("PathFinder (Dijkstra)", path_finder.get_shortest_path),
+                         ("PathFinder (bidirectional)",
+                          lambda start, end: path_finder.get_shortest_path(start, end, algorithm="bidirectional")),
+                         ("ContractionHierarchy", hierarchy.get_shortest_path)):
+        started = time.perf_counter()
+        for start, end in pairs:
+            query(start, end)
+        query_time = (time.perf_counter() - started) / queries
+        print(f"{label}: {query_time * 1e6:.1f} us per query")
+
+
+if __name__ == "__main__":
+    test_hierarchy()
+    benchmark_hierarchy()
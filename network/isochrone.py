@@ -0,0 +1,101 @@
+class Isochrone:
+    """ Stations reachable within a time budget from one or several origins, with their arrival times.
+
+    An Isochrone is the result of PathFinder.get_isochrone. The arrival time of a station is the duration of the
+    shortest path to it from the closest origin (the origins themselves have an arrival time of 0):
+    - arrival_times: key: station ID, value: arrival time (in minutes), for every station reached within the budget
+
+    The stations, zones and coordinates are read from the TubeMap the isochrone was computed for, so the results can
+    be grouped by zone or exported as points directly.
+    """
+
+    def __init__(self, tubemap, origins, time_budget, arrival_times):
+        """
+        Args:
+            tubemap (TubeMap) : tube map the isochrone was computed for
+            origins (list) : IDs of the origin stations
+            time_budget (int) : maximum arrival time (in minutes)
+            arrival_times (dict) : key: station ID, value: arrival time (in minutes)
+        """
+        self.tubemap = tubemap
+        self.origins = origins
+        self.time_budget = time_budget
+        self.arrival_times = arrival_times
+
+    def get_arrival_times(self):
+        """ Returns the arrival time at each station reached
+
+        Returns:
+            arrival_times (dict) : key: Station object, value: arrival time (in minutes), ordered by arrival time
+        """
+
+        stations = self.tubemap.stations
+        return {stations[station]: time
+                for station, time in sorted(self.arrival_times.items(), key=lambda item: item[1])}
+
+    def get_stations_by_zone(self):
+        """ Groups the stations reached by zone (a station in two zones appears in both)
+
+        Returns:
+            zones (dict) : key: zone number (int), value: list of (Station object, arrival time) sorted by arrival
+                time, with the zones in increasing order
+        """
+
+        zones = {}
+        for station_obj, time in self.get_arrival_times().items():
+            for zone in station_obj.zones:
+                zones.setdefault(zone, []).append((station_obj, time))
+
+        return {zone: zones[zone] for zone in sorted(zones)}
+
+    def get_points(self):
+        """ Exports the stations reached as points, for instance to draw them on a map
+
+        Returns:
+            points (list) : for each station reached whose coordinates are known, a dict with its "id", "name",
+                "latitude", "longitude" and arrival "time", sorted by arrival time (JSON serialisable)
+        """
+
+        coordinates = self.tubemap.coordinates
+
+        points = []
+        for station_obj, time in self.get_arrival_times().items():
+            if station_obj.id not in coordinates:
+                continue
+            latitude, longitude = coordinates[station_obj.id]
+            points.append({"id": station_obj.id, "name": station_obj.name,
+                           "latitude": latitude, "longitude": longitude, "time": time})
+
+        return points
+
+
+def test_isochrone():
+    from network.path import PathFinder
+    from tube.map import TubeMap
+    tubemap = TubeMap()
+    tubemap.import_from_json("data/london.json")
+
+    path_finder = PathFinder(tubemap)
+    isochrone = path_finder.get_isochrone("Covent Garden", 10)
+
+    durations = path_finder.get_durations_from("Covent Garden", list(tubemap.stations_by_name))
+    expected = {name: duration for name, duration in durations.items() if duration is not None and duration <= 10}
+    arrival_times = {station_obj.name: time for station_obj, time in isochrone.get_arrival_times().items()}
+    assert arrival_times == expected
+
+    zones = isochrone.get_stations_by_zone()
+    assert [station_obj.name for station_obj, time in zones[1]][0] == "Covent Garden"
+
+    points = isochrone.get_points()
+    assert points[0]["name"] == "Covent Garden" and points[0]["time"] == 0
+
+    # Several origins: each station is reached from the closest one
+    isochrone = path_finder.get_isochrone(["Covent Garden", "Stockwell"], 10)
+    assert isochrone.arrival_times[tubemap.stations_by_name["Stockwell"].id] == 0
+    assert len(isochrone.arrival_times) > len(arrival_times)
+
+    assert path_finder.get_isochrone("Nowhere", 10) is None
+
+
+if __name__ == "__main__":
+    test_isochrone()
@@ -0,0 +1,176 @@
+import heapq
+import math
+
+from network.graph import graph_cache
+
+DEFAULT_INTERCHANGE_PENALTY = 5  # in minutes
+
+
+class LineGraph:
+    """ Expanded graph whose states are (station, line) pairs, used to route with line changes.
+
+    A traveller at station S on line L can either ride a connection of line L from S (costing its time), or
+    change to another line at S (costing the interchange penalty). Each state is numbered, and for each state the
+    graph keeps the connections of its line leaving its station:
+    - states: (station ID, line ID) of each state
+    - station_states: key: station ID, value: numbers of the states at this station (one per line serving it)
+    - rides: for each state, list of (number of the state reached, Connection)
+
+    The Connection instances are kept in the graph, so their current time is used by every search.
+    """
+
+    def __init__(self, states, station_states, rides):
+        """
+        Args:
+            states (list) : (station ID, line ID) of each state
+            station_states (dict) : key: station ID, value: list of the numbers of the states at the station
+            rides (list) : for each state, list of (number of the state reached, Connection)
+        """
+        self.states = states
+        self.station_states = station_states
+        self.rides = rides
+
+    @classmethod
+    def build(cls, tubemap):
+        """ Expands the graph of a TubeMap (see network.graph) into (station, line) states
+
+        Args:
+            tubemap (TubeMap) : tube map whose graph should be expanded
+
+        Returns:
+            line_graph (LineGraph) : expanded graph of the TubeMap
+        """
+
+        graph = graph_cache.get(tubemap)
+
+        states = []
+        state_indexes = {}  # key: (station ID, line ID), value: number of the state
+        station_states = {station: [] for station in graph}
+
+        for station, neighbours in graph.items():
+            for connections in neighbours.values():
+                for connection_obj in connections:
+                    state = (station, connection_obj.line.id)
+                    if state not in state_indexes:
+                        state_indexes[state] = len(states)
+                        states.append(state)
+                        station_states[station].append(state_indexes[state])
+
+        rides = [[] for _ in states]
+        for station, neighbours in graph.items():
+            for neighbour, connections in neighbours.items():
+                for connection_obj in connections:
+                    line = connection_obj.line.id
+                    rides[state_indexes[(station, line)]].append((state_indexes[(neighbour, line)], connection_obj))
+
+        return cls(states, station_states, rides)
+
+    def get_journey(self, start_station, end_station, interchange_penalty=DEFAULT_INTERCHANGE_PENALTY):
+        """ Searches ONE fastest journey between two stations, counting a penalty for each change of line
+
+        Dijkstra's algorithm runs on the states, starting from every line serving the start station (boarding is
+        free) and stopping at the first state of the end station visited.
+
+        Args:
+            start_station (str) : ID of the starting station
+            end_station (str) : ID of the ending station
+            interchange_penalty (int) : time (in minutes) added for each change of line
+
+        Returns:
+            journey (tuple) : (duration, station IDs, connections) of the journey, where the duration includes the
+                interchange penalties and the connections are the Connection instances ridden, in order.
+                None if the end station cannot be reached.
+        """
+
+        if start_station == end_station:
+            return 0, [start_station], []
+
+        tentative_distance = {}
+        previous_state = {}  # key: state number, value: (previous state number, Connection ridden or None)
+        visited_states = set()
+        priority_queue = []
+
+        for state in self.station_states[start_station]:
+            tentative_distance[state] = 0
+            previous_state[state] = None
+            priority_queue.append((0, state))
+        heapq.heapify(priority_queue)
+
+        end_state = None
+        while len(priority_queue) > 0:
+            current_distance, current_state = heapq.heappop(priority_queue)
+            if current_state in visited_states:
+                continue
+            visited_states.add(current_state)
+
+            current_station = self.states[current_state][0]
+            if current_station == end_station:
+                end_state = current_state
+                break
+
+            moves = [(state, connection_obj.time, connection_obj)
+                     for state, connection_obj in self.rides[current_state]]
+            moves += [(state, interchange_penalty, None) for state in self.station_states[current_station]
+                      if state != current_state]
+
+            for state, time, connection_obj in moves:
+                alt = current_distance + time
+                if state not in visited_states and alt < tentative_distance.get(state, math.inf):
+                    tentative_distance[state] = alt
+                    previous_state[state] = (current_state, connection_obj)
+                    heapq.heappush(priority_queue, (alt, state))
+
+        if end_state is None:
+            return None
+
+        # Walks back from the end state, keeping the rides only (changes of line stay at the same station)
+        stations = [self.states[end_state][0]]
+        connections = []
+        state = end_state
+        while previous_state[state] is not None:
+            state, connection_obj = previous_state[state]
+            if connection_obj is not None:
+                connections.append(connection_obj)
+                stations.append(self.states[state][0])
+        stations.reverse()
+        connections.reverse()
+
+        return tentative_distance[end_state], stations, connections
+
+
+def test_lines():
+    from network.path import PathFinder
+    from tube.map import TubeMap
+    tubemap = TubeMap()
+    tubemap.import_from_json("data/london.json")
+
+    path_finder = PathFinder(tubemap)
+    duration, stations, connections = path_finder.get_journey("Covent Garden", "Green Park")
+
+    station_names = [station.name for station in stations]
+    expected = ["Covent Garden", "Leicester Square", "Piccadilly Circus",
+                "Green Park"]
+    assert station_names == expected
+    assert len(connections) == len(stations) - 1
+    assert {connection.line.name for connection in connections} == {"Piccadilly Line"}
+
+    # Without penalty, the journeys are as fast as the shortest paths
+    names = sorted(tubemap.stations_by_name)
+    for start_station_name in names[::30]:
+        durations = path_finder.get_durations_from(start_station_name, names)
+        for end_station_name in names[::7]:
+            duration, stations, connections = path_finder.get_journey(start_station_name, end_station_name, 0)
+            assert duration == durations[end_station_name], (start_station_name, end_station_name)
+            assert sum(connection.time for connection in connections) == duration
+
+    # Covent Garden -> South Kensington: 10 minutes with two changes of line, 11 minutes on the Piccadilly Line only
+    duration, stations, connections = path_finder.get_journey("Covent Garden", "South Kensington", 0)
+    assert duration == 10
+    assert len({connection.line.name for connection in connections}) > 1
+    duration, stations, connections = path_finder.get_journey("Covent Garden", "South Kensington")
+    assert duration == 11
+    assert {connection.line.name for connection in connections} == {"Piccadilly Line"}
+
+
+if __name__ == "__main__":
+    test_lines()
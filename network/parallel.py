@@ -0,0 +1,122 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from network.path import PathFinder
+from tube.map import TubeMap
+
+worker_path_finder = None  # PathFinder of the current worker process, set up by initialise_worker
+
+
+def initialise_worker(filepath, snapshot_filepath=None):
+    """ Loads the TubeMap and builds its graph once per worker process
+
+    Args:
+        filepath (str) : path to the JSON file describing the tube map
+        snapshot_filepath (str) : path to a binary snapshot of the JSON file (see TubeMap.import_with_snapshot),
+            None to import the JSON file directly
+    """
+    global worker_path_finder
+
+    tubemap = TubeMap()
+    if snapshot_filepath is None:
+        tubemap.import_from_json(filepath)
+    else:
+        tubemap.import_with_snapshot(filepath, snapshot_filepath)
+
+    worker_path_finder = PathFinder(tubemap)
+    worker_path_finder.graph  # builds the graph before the first query
+
+
+def find_shortest_paths(pairs):
+    """ Computes the shortest paths of a shard of queries in a worker process
+
+    Args:
+        pairs (list) : (start station name, end station name) of each query
+
+    Returns:
+        paths (list) : for each query, the names of the stations of ONE shortest path,
+            None if one of the stations does not exist
+    """
+
+    paths = []
+    for start_station_name, end_station_name in pairs:
+        stations = worker_path_finder.get_shortest_path(start_station_name, end_station_name)
+        if stations is None:
+            paths.append(None)
+        else:
+            paths.append([station.name for station in stations])
+
+    return paths
+
+
+class ParallelPathFinder:
+    """ Runs large batches of shortest path queries on a pool of processes.
+
+    Each worker process loads the tube map and builds its graph once, when it starts, so that only the station
+    names of the queries and of the results go through the pool. The queries are split into shards of
+    `shard_size` queries, and the results are returned in the order of the queries.
+
+    The pool is kept between batches; it should be shut down with `close` (or by using the object in a `with`
+    statement).
+    """
+
+    def __init__(self, filepath, max_workers=None, shard_size=1000, snapshot_filepath=None):
+        """
+        Args:
+            filepath (str) : path to the JSON file describing the tube map
+            max_workers (int) : number of worker processes, defaults to the number of processors
+            shard_size (int) : number of queries sent to a worker at once
+            snapshot_filepath (str) : path to a binary snapshot of the JSON file, loaded by the workers instead of
+                the JSON file when it is up to date
+        """
+        assert shard_size > 0, "The shard size must be positive"
+
+        self.shard_size = shard_size
+        self.executor = ProcessPoolExecutor(max_workers=max_workers, initializer=initialise_worker,
+                                            initargs=(filepath, snapshot_filepath))
+
+    def get_shortest_paths(self, pairs):
+        """ Find ONE shortest path for each (start station name, end station name) pair
+
+        Args:
+            pairs (list) : (start station name, end station name) of each query
+
+        Returns:
+            paths (list) : for each query, in the same order, the names of the stations of ONE shortest path
+                from the start station to the end station, None if one of the stations does not exist
+        """
+
+        pairs = list(pairs)
+        shards = [pairs[index:index + self.shard_size] for index in range(0, len(pairs), self.shard_size)]
+
+        paths = []
+        for shard_paths in self.executor.map(find_shortest_paths, shards):
+            paths.extend(shard_paths)
+
+        return paths
+
+    def close(self):
+        """ Shuts the pool of worker processes down """
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def test_parallel():
+    pairs = [("Covent Garden", "Green Park"), ("Stockwell", "South Kensington"), ("Covent Garden", "Nowhere")]
+
+    with ParallelPathFinder("data/london.json", max_workers=2, shard_size=1) as path_finder:
+        paths = path_finder.get_shortest_paths(pairs)
+
+    expected = ["Covent Garden", "Leicester Square", "Piccadilly Circus",
+                "Green Park"]
+    assert paths[0] == expected
+    assert paths[1][0] == "Stockwell" and paths[1][-1] == "South Kensington"
+    assert paths[2] is None
+
+
+if __name__ == "__main__":
+    test_parallel()
@@ -1,6 +1,14 @@
-from network.graph import NeighbourGraphBuilder
+from network.cache import PathCache
+from network.csr import CSRGraph, PartialSearch, get_fingerprint
+from network.graph import graph_cache
+from network.isochrone import Isochrone
+from network.lines import DEFAULT_INTERCHANGE_PENALTY, LineGraph
+from network.zones import ZoneRouter
+import heapq
 import math
 
+EARTH_RADIUS = 6371.0  # in km
+
 
 class PathFinder:
     """
@@ -9,19 +17,33 @@ class PathFinder:
     - completing the "get_shortest_path()" method (don't hesitate to divide your code into several sub-methods)
     """
 
-    def __init__(self, tubemap):
+    def __init__(self, tubemap, backend="dict", cache_size=None):
         """
         Args:
             tubemap (TubeMap) : The TubeMap to use.
+            backend (str) : "dict" (default) to run Dijkstra's algorithm on the nested dict graph, or "csr" to run
+                it on the compact array-backed graph (see network.csr)
+            cache_size (int) : if given, the last cache_size paths found by get_shortest_path are kept in a
+                least-recently-used cache (see network.cache)
         """
-        self.tubemap = tubemap
-
-        graph_builder = NeighbourGraphBuilder()
-        self.graph = graph_builder.build(self.tubemap)
-
-        # Feel free to add anything else needed here.
+        assert backend in ("dict", "csr"), f"Unknown graph backend: {backend}"
 
-    def get_shortest_path(self, start_station_name, end_station_name):
+        self.tubemap = tubemap
+        self.backend = backend
+        self.csr_graph = None  # (TubeMap version, CSRGraph), see get_csr_graph
+        self.max_speed = None  # (TubeMap version, fastest speed observed on the network in km/min)
+        self.station_vectors = None  # (TubeMap version, positions of the stations), see get_station_vectors
+        self.table = None  # (TubeMap version, precomputed ShortestPathTable), see use_table
+        self.path_cache = None if cache_size is None else PathCache(cache_size)
+        self.line_graph = None  # (TubeMap version, LineGraph), see get_line_graph
+        self.zone_router = None  # (TubeMap version, ZoneRouter), see get_zone_router
+
+    @property
+    def graph(self):
+        """ dict : graph of the TubeMap, built once and shared through the graph cache (see network.graph) """
+        return graph_cache.get(self.tubemap)
+
+    def get_shortest_path(self, start_station_name, end_station_name, algorithm="dijkstra"):
         """ Find ONE shortest path (in terms of duration) from start_station_name to end_station_name.
 
         For instance, get_shortest_path('Stockwell', 'South Kensington') should return the list:
@@ -41,9 +63,23 @@ class PathFinder:
         
         Alternatively, find the pseudocode on Wikipedia: https://en.wikipedia.org/wiki/Dijkstra's_algorithm#Pseudocode
 
+        With algorithm="astar", the search is guided towards the end station by a lower bound of the remaining
+        travel time (see get_astar_heuristic). It finds paths with the same durations while visiting fewer stations.
+        With algorithm="bidirectional", two searches run from both ends and stop when they meet
+        (see bidirectional_algorithm).
+
+        With the "csr" backend, Dijkstra's algorithm runs on the array-backed graph; the other algorithms always
+        use the nested dict graph.
+
+        When a precomputed table of all the shortest paths is in use (see use_table), the path is read from the
+        table without running any search, whatever the algorithm.
+
+        When the PathFinder has a cache, the paths already found (in either direction) are read from the cache.
+
         Args:
             start_station_name (str): name of the starting station
             end_station_name (str): name of the ending station
+            algorithm (str): "dijkstra" (default), "astar" or "bidirectional"
 
         Returns:
             path (list) : list of Station objects corresponding to ONE
@@ -51,9 +87,7 @@ class PathFinder:
                 Returns None if start_station_name or end_station_name does not exist.
         """
 
-        # Initialization
-        graph_builder = NeighbourGraphBuilder()
-        graph = graph_builder.build(self.tubemap)
+        assert algorithm in ("dijkstra", "astar", "bidirectional"), f"Unknown shortest path algorithm: {algorithm}"
 
         # Makes sure the start and end stations are valid ones, returns a None value otherwise
         try:
@@ -61,66 +95,409 @@ class PathFinder:
             start_station_obj = self.tubemap.stations[start_station_id]
             end_station_id = self.get_id(end_station_name)
             end_station_obj = self.tubemap.stations[end_station_id]
-        except AssertionError and AttributeError:
+        except (AssertionError, AttributeError):
+            return None
+
+        if self.path_cache is None:
+            return self.search_shortest_path(start_station_obj, end_station_obj, algorithm)
+
+        path_ids = self.path_cache.get(start_station_obj.id, end_station_obj.id, self.tubemap.version)
+        if path_ids is not None:
+            return [self.tubemap.stations[station] for station in path_ids]
+
+        path = self.search_shortest_path(start_station_obj, end_station_obj, algorithm)
+        if path is not None:
+            self.path_cache.put([station_obj.id for station_obj in path], self.tubemap.version)
+
+        return path
+
+    def get_k_shortest_paths(self, start_station_name, end_station_name, k=3):
+        """ Find the k shortest loopless paths (in terms of duration) from start_station_name to end_station_name,
+                with Yen's algorithm.
+
+        Each path after the first one deviates from a previous path at some "spur" station: the start of the
+        previous path is kept, and a spur search looks for the shortest path from the spur station to the end
+        station avoiding the stations of that start and the connections already used to leave the spur station.
+
+        All the searches run on the array-backed graph (see network.csr) and share the work of a single search
+        from the end station, stopped at the start station (see PartialSearch). It gives the first path, and lower
+        bounds of the durations to the end station (removing stations and connections can only make paths longer):
+        the spur searches are A* searches guided by them, which go almost straight to the end station. Once there
+        are enough candidate paths, the spur searches also skip the stations which cannot be on a path shorter than
+        the k-th candidate.
+
+        Args:
+            start_station_name (str): name of the starting station
+            end_station_name (str): name of the ending station
+            k (int): number of paths wanted
+
+        Returns:
+            paths (list) : up to k (duration, path) tuples sorted by duration, where path is a list of Station
+                objects as returned by get_shortest_path. Returns None if start_station_name or end_station_name
+                does not exist.
+        """
+
+        start_station_obj = self.get_object(start_station_name)
+        end_station_obj = self.get_object(end_station_name)
+        if start_station_obj is None or end_station_obj is None:
+            return None
+
+        csr_graph = self.get_csr_graph()
+        start = csr_graph.station_indexes[start_station_obj.id]
+        end = csr_graph.station_indexes[end_station_obj.id]
+
+        # Search from the end station (the graph is undirected), until the start station is visited
+        end_search = PartialSearch(csr_graph, end, start)
+        if not end_search.visited_stations[start]:
+            return []
+
+        first_path = [start]
+        while first_path[-1] != end:
+            first_path.append(end_search.previous_station[first_path[-1]])
+
+        found_paths = [(end_search.distance[start], first_path)]
+        candidate_paths = []  # heap of (duration, path) of the candidates for the next path
+        known_paths = {tuple(first_path)}
+
+        while len(found_paths) < k:
+            previous_path = found_paths[-1][1]
+
+            root_duration = 0
+            for position in range(len(previous_path) - 1):
+                spur_station = previous_path[position]
+                root_path = previous_path[:position + 1]
+
+                excluded_neighbours = {path[position + 1] for duration, path in found_paths
+                                       if path[:position + 1] == root_path}
+                excluded_stations = set(root_path[:-1])
+
+                # Only the paths up to the duration of the k-th path found or candidate can be one of the k paths
+                n_missing = k - len(found_paths)
+                max_duration = heapq.nsmallest(n_missing, candidate_paths)[-1][0] - root_duration \
+                    if len(candidate_paths) >= n_missing else math.inf
+
+                spur = self.spur_search(csr_graph, spur_station, end, excluded_stations, excluded_neighbours,
+                                        end_search, max_duration)
+                if spur is not None:
+                    spur_duration, spur_path = spur
+                    path = root_path[:-1] + spur_path
+                    if tuple(path) not in known_paths:
+                        known_paths.add(tuple(path))
+                        heapq.heappush(candidate_paths, (root_duration + spur_duration, path))
+
+                root_duration += min(csr_graph.weights[entry] for entry in
+                                     range(csr_graph.offsets[spur_station], csr_graph.offsets[spur_station + 1])
+                                     if csr_graph.targets[entry] == previous_path[position + 1])
+
+            if len(candidate_paths) == 0:
+                break
+            found_paths.append(heapq.heappop(candidate_paths))
+
+        return [(duration, [self.tubemap.stations[csr_graph.station_ids[station]] for station in path])
+                for duration, path in found_paths]
+
+    def spur_search(self, csr_graph, spur_station, end_station, excluded_stations, excluded_neighbours, end_search,
+                    max_duration):
+        """ A* search of the shortest path from the spur station to the end station, for get_k_shortest_paths
+
+        Args:
+            csr_graph (CSRGraph) : graph of the TubeMap in CSR format
+            spur_station (int) : number of the station the search starts from
+            end_station (int) : number of the ending station
+            excluded_stations (set) : numbers of the stations the path must avoid
+            excluded_neighbours (set) : numbers of the stations the path must not go to directly from the spur
+                station
+            end_search (PartialSearch) : search from the end station, giving the lower bounds of the durations to
+                the end station
+            max_duration (float) : maximum duration of the path, the longer paths are not searched
+
+        Returns:
+            spur (tuple) : (duration, station numbers) of the path found, None if there is none
+        """
+
+        offsets = csr_graph.offsets
+        targets = csr_graph.targets
+        weights = csr_graph.weights
+        distance_to_end = end_search.distance
+        visited_by_end_search = end_search.visited_stations
+        radius = end_search.radius
+
+        tentative_distance = {spur_station: 0}
+        previous_station = {spur_station: None}
+        visited_stations = set()
+        priority_queue = [(0, spur_station)]
+
+        while len(priority_queue) > 0:
+            current_priority, current_station = heapq.heappop(priority_queue)
+            if current_station in visited_stations:
+                continue
+            visited_stations.add(current_station)
+
+            if current_station == end_station:
+                path = []
+                while current_station is not None:
+                    path.append(current_station)
+                    current_station = previous_station[current_station]
+                path.reverse()
+                return tentative_distance[end_station], path
+
+            current_distance = tentative_distance[current_station]
+            for position in range(offsets[current_station], offsets[current_station + 1]):
+                neighbour = targets[position]
+                if (neighbour in visited_stations or neighbour in excluded_stations
+                        or (current_station == spur_station and neighbour in excluded_neighbours)):
+                    continue
+
+                alt = current_distance + weights[position]
+                if alt < tentative_distance.get(neighbour, math.inf):
+                    # Lower bound of the duration from the neighbour to the end station (see PartialSearch)
+                    priority = alt + (distance_to_end[neighbour] if visited_by_end_search[neighbour] else radius)
+                    if priority > max_duration:
+                        continue
+                    tentative_distance[neighbour] = alt
+                    previous_station[neighbour] = current_station
+                    heapq.heappush(priority_queue, (priority, neighbour))
+
+        return None
+
+    def get_journey(self, start_station_name, end_station_name, interchange_penalty=DEFAULT_INTERCHANGE_PENALTY):
+        """ Find ONE fastest journey from start_station_name to end_station_name, taking the changes of line into
+                account.
+
+        Unlike get_shortest_path, which may switch lines at every station, each change of line costs
+        interchange_penalty minutes (see network.lines).
+
+        Args:
+            start_station_name (str): name of the starting station
+            end_station_name (str): name of the ending station
+            interchange_penalty (int): time (in minutes) added for each change of line
+
+        Returns:
+            journey (tuple) : (duration, stations, connections), where duration (int) is the duration of the
+                journey including the interchange penalties, stations (list) the Station objects of the journey and
+                connections (list) the Connection objects ridden between them.
+                Returns None if start_station_name or end_station_name does not exist, or if there is no journey.
+        """
+
+        start_station_obj = self.get_object(start_station_name)
+        end_station_obj = self.get_object(end_station_name)
+        if start_station_obj is None or end_station_obj is None:
+            return None
+
+        journey = self.get_line_graph().get_journey(start_station_obj.id, end_station_obj.id, interchange_penalty)
+        if journey is None:
+            return None
+
+        duration, station_ids, connections = journey
+        return duration, [self.tubemap.stations[station] for station in station_ids], connections
+
+    def get_line_graph(self):
+        """ Returns the (station, line) graph of the TubeMap, expanding it again when the TubeMap has changed
+
+        Returns:
+            line_graph (LineGraph) : expanded graph of the TubeMap
+        """
+
+        if self.line_graph is None or self.line_graph[0] != self.tubemap.version:
+            self.line_graph = (self.tubemap.version, LineGraph.build(self.tubemap))
+
+        return self.line_graph[1]
+
+    def get_shortest_path_in_zones(self, start_station_name, end_station_name, zones):
+        """ Find ONE shortest path (in terms of duration) from start_station_name to end_station_name, going only
+                through stations of the given zones.
+
+        Args:
+            start_station_name (str): name of the starting station
+            end_station_name (str): name of the ending station
+            zones (set): numbers of the zones allowed (a station in two zones is allowed if one of them is)
+
+        Returns:
+            path (list) : list of Station objects corresponding to ONE shortest path within the zones.
+                Returns None if start_station_name or end_station_name does not exist, or if there is no such path.
+        """
+
+        start_station_obj = self.get_object(start_station_name)
+        end_station_obj = self.get_object(end_station_name)
+        if start_station_obj is None or end_station_obj is None:
+            return None
+
+        path_ids = self.get_zone_router().get_path(self.graph, start_station_obj.id, end_station_obj.id, set(zones))
+        if path_ids is None:
             return None
 
-        unvisited_stations = set(self.tubemap.stations.keys())
+        return [self.tubemap.stations[station] for station in path_ids]
+
+    def get_pareto_journeys(self, start_station_name, end_station_name):
+        """ Find the journeys from start_station_name to end_station_name which are Pareto-optimal for their
+                duration, the number of zone boundaries they cross and their number of changes of line.
+
+        See ZoneRouter.get_pareto_journeys (network.zones).
+
+        Args:
+            start_station_name (str): name of the starting station
+            end_station_name (str): name of the ending station
+
+        Returns:
+            journeys (list) : for each journey, sorted by duration, a tuple (duration, zones crossed, changes,
+                stations, connections), where stations (list) are the Station objects of the journey and
+                connections (list) the Connection objects ridden between them.
+                Returns None if start_station_name or end_station_name does not exist.
+        """
+
+        start_station_obj = self.get_object(start_station_name)
+        end_station_obj = self.get_object(end_station_name)
+        if start_station_obj is None or end_station_obj is None:
+            return None
+
+        journeys = []
+        for duration, zones_crossed, changes, station_ids, connections in \
+                self.get_zone_router().get_pareto_journeys(self.graph, start_station_obj.id, end_station_obj.id):
+            stations = [self.tubemap.stations[station] for station in station_ids]
+            journeys.append((duration, zones_crossed, changes, stations, connections))
+
+        return journeys
+
+    def get_zone_router(self):
+        """ Returns the zone router of the TubeMap, building it again when the TubeMap has changed
+
+        Returns:
+            zone_router (ZoneRouter) : zone router of the TubeMap
+        """
+
+        if self.zone_router is None or self.zone_router[0] != self.tubemap.version:
+            self.zone_router = (self.tubemap.version, ZoneRouter(self.tubemap.stations, self.get_line_graph()))
+
+        return self.zone_router[1]
+
+    def search_shortest_path(self, start_station_obj, end_station_obj, algorithm):
+        """ Searches ONE shortest path between two existing stations with the given algorithm
+
+        The nested dict graph is only built for the searches running on it: a table or the "csr" backend do not
+        need it.
+
+        Args:
+            start_station_obj (Station) : starting station
+            end_station_obj (Station) : ending station
+            algorithm (str) : "dijkstra", "astar" or "bidirectional" (see get_shortest_path)
+
+        Returns:
+            path (list) : list of Station objects corresponding to ONE shortest path,
+                None if the end station cannot be reached
+        """
+
+        table = self.get_table()
+        if table is not None:
+            path_ids = table.get_path(start_station_obj.id, end_station_obj.id)
+            if path_ids is None:
+                return None
+            return [self.tubemap.stations[station] for station in path_ids]
+
+        if algorithm == "dijkstra" and self.backend == "csr":
+            path_ids = self.get_csr_graph().get_path(start_station_obj.id, end_station_obj.id)
+            if path_ids is None:
+                return None
+            return [self.tubemap.stations[station] for station in path_ids]
+
+        graph = self.graph
+
+        if algorithm == "bidirectional":
+            path_ids = self.bidirectional_algorithm(start_station_obj.id, end_station_obj.id, graph)
+            if path_ids is None:
+                return None
+            return [self.tubemap.stations[station] for station in path_ids]
 
         path_dict = {}  # Keeps a history of the connection leading to the station which was found most effective
         tentative_distance = {}  # Keeps a count of the 'distance' each station represents from the starting station
 
-        # Set up the appropriate nested dictionary structure to path_dict and tentative_distance:
-        #   - Initialize the tentative_distance values as infinite values
-        #       for all stations except the starting one which should be 0
-        #   - Initialize the path_dict values as None no matter the station
-        for station in unvisited_stations:
+        # Only the starting station is known at first: its distance is 0 and it has no previous station.
+        # Stations missing from tentative_distance are implicitly at an infinite distance.
+        tentative_distance[start_station_obj.id] = 0
+        path_dict[start_station_obj.name] = None
 
-            if station == start_station_obj.id:
-                tentative_distance[station] = 0
-                name_station = self.get_name(station)
-                path_dict[name_station] = None
-            else:
-                tentative_distance[station] = math.inf
-                name_station = self.get_name(station)
-                path_dict[name_station] = None
+        # A* is Dijkstra's algorithm with the stations ordered by their distance plus a lower bound
+        # of their remaining distance to the end station
+        heuristic = None
+        if algorithm == "astar":
+            heuristic = self.get_astar_heuristic(end_station_obj.id)
 
         # Starting Dijkstra's algorithm to find the shortest path (exhaustive comments in the function)
-        self.dijkstra_algorithm(unvisited_stations, tentative_distance, graph, path_dict)
+        self.dijkstra_algorithm(start_station_obj.id, end_station_obj.id, tentative_distance, graph, path_dict,
+                                heuristic)
+
+        # The end station has not been reached: there is no path
+        if end_station_obj.name not in path_dict:
+            return None
 
         # Process path_dict to get the actual, readable result gathered in the list path
-        path = self.process(path_dict, start_station_name, end_station_name, end_station_obj)
+        path = self.process(path_dict, start_station_obj.name, end_station_obj.name, end_station_obj)
 
         return path
 
-    def dijkstra_algorithm(self, unvisited_stations, tentative_distance, graph, path_dict):
-        """ The core algorithm which computes the shortest path between the start station and all the other stations,
+    def dijkstra_algorithm(self, start_station, end_station, tentative_distance, graph, path_dict, heuristic=None):
+        """ The core algorithm which computes the shortest path between the start station and the end station,
                 keeping track of the 'distances' in a dictionary 'path_dict'
 
+        The stations left to visit are kept in a priority queue (binary heap) ordered by their tentative distance,
+        so picking the closest one costs O(log V) instead of a scan over all the unvisited stations. A station may
+        be pushed several times (once per improvement), the outdated entries are simply skipped when popped.
+        The search stops as soon as the end station is popped, since its distance can no longer improve. When several
+        end stations are given, it stops once all of them have been popped.
+
+        When a heuristic is given (A* search), the priority of a station is its tentative distance plus the
+        heuristic value of the station. The heuristic must be consistent for the search to remain exact.
+
         Args:
-            unvisited_stations (set) : keeps a log of the stations that have not been visited by the algorithm yet
+            start_station (str) : ID of the starting station
+            end_station (str) : ID of the ending station, a set of IDs of ending stations, or None to visit every
+                reachable station
             tentative_distance (dict) : keeps a count of the 'distance' each station represents from the starting
                 station
             graph (dict) : nested dictionary encoding neighbouring connections between stations
             path_dict (dict) : keeps a history of the connection leading to the station which was found most effective
+            heuristic (function) : optional function giving a lower bound of the distance from a station ID
+                to the end station
 
         Returns:
             path_dict (dict) : Updated path_dict
         """
 
-        while len(unvisited_stations) > 0:
+        if heuristic is None:
+            def heuristic(station):
+                return 0
+
+        priority_queue = [(tentative_distance[start_station] + heuristic(start_station), start_station)]
+        visited_stations = set()
+
+        remaining_end_stations = None
+        if isinstance(end_station, str):
+            remaining_end_stations = {end_station}
+        elif end_station is not None:
+            remaining_end_stations = set(end_station)
+
+        while len(priority_queue) > 0:
 
             # 'current station' must be the station with the lowest distance
-            current_station = self.get_lowest_value_station(unvisited_stations,
-                                                            tentative_distance)
+            current_priority, current_station = heapq.heappop(priority_queue)
+
+            # Skips outdated entries of stations which have already been visited
+            if current_station in visited_stations:
+                continue
 
             # Make sure we do not visit twice this station
-            unvisited_stations.remove(current_station)
+            visited_stations.add(current_station)
+
+            # The distance of the end station is final once it is visited
+            if remaining_end_stations is not None:
+                remaining_end_stations.discard(current_station)
+                if len(remaining_end_stations) == 0:
+                    break
 
             # Visits each neighbour of the current station (or node)
             for neighbour in graph[current_station]:
 
                 # Makes sure the neighbour station has not been visited yet
-                if neighbour not in unvisited_stations:
+                if neighbour in visited_stations:
                     continue
                 else:
 
@@ -129,7 +506,561 @@ class PathFinder:
 
                     # Looks if the way we normally reach this neighbour is
                     # faster or not than through our current station
-                    self.is_better(path_dict, tentative_distance, neighbour, alt, current_station, connection_used)
+                    if self.is_better(path_dict, tentative_distance, neighbour, alt, current_station,
+                                      connection_used):
+                        heapq.heappush(priority_queue, (alt + heuristic(neighbour), neighbour))
+
+        return path_dict
+
+    def get_shortest_paths_from(self, start_station_name, end_station_names):
+        """ Find ONE shortest path from start_station_name to each of the end stations, with a single search.
+
+        The search stops as soon as all the end stations have been reached.
+
+        Args:
+            start_station_name (str): name of the starting station
+            end_station_names (list): names of the ending stations
+
+        Returns:
+            paths (dict) : key: name of an ending station, value: list of Station objects corresponding to ONE
+                shortest path from start_station_name to this station (as returned by get_shortest_path).
+                The value is None if the station does not exist or cannot be reached.
+        """
+
+        path_dict, tentative_distance = self.search_from(start_station_name, end_station_names)
+
+        paths = {}
+        for end_station_name in end_station_names:
+            end_station_obj = self.get_object(end_station_name)
+            if end_station_obj is None or end_station_obj.name not in path_dict:
+                paths[end_station_name] = None
+            else:
+                start_station_obj = self.get_object(start_station_name)
+                paths[end_station_name] = self.process(path_dict, start_station_obj.name, end_station_obj.name,
+                                                       end_station_obj)
+
+        return paths
+
+    def get_durations_from(self, start_station_name, end_station_names):
+        """ Find the duration of the shortest path from start_station_name to each of the end stations,
+                with a single search.
+
+        Args:
+            start_station_name (str): name of the starting station
+            end_station_names (list): names of the ending stations
+
+        Returns:
+            durations (dict) : key: name of an ending station, value: duration (in minutes) of the shortest path
+                from start_station_name to this station. The value is None if the station does not exist or
+                cannot be reached.
+        """
+
+        table = self.get_table()
+        start_station_obj = self.get_object(start_station_name)
+
+        if table is not None and start_station_obj is not None:
+            durations = {}
+            for end_station_name in end_station_names:
+                end_station_obj = self.get_object(end_station_name)
+                if end_station_obj is None:
+                    durations[end_station_name] = None
+                else:
+                    durations[end_station_name] = table.get_duration(start_station_obj.id, end_station_obj.id)
+            return durations
+
+        path_dict, tentative_distance = self.search_from(start_station_name, end_station_names)
+
+        durations = {}
+        for end_station_name in end_station_names:
+            end_station_obj = self.get_object(end_station_name)
+            if end_station_obj is None or end_station_obj.name not in path_dict:
+                durations[end_station_name] = None
+            else:
+                durations[end_station_name] = tentative_distance[end_station_obj.id]
+
+        return durations
+
+    def get_duration_matrix(self, start_station_names, end_station_names):
+        """ Find the durations of the shortest paths from each start station to each end station,
+                with one search per start station.
+
+        Args:
+            start_station_names (list): names of the starting stations
+            end_station_names (list): names of the ending stations
+
+        Returns:
+            matrix (list) : matrix[i][j] is the duration (in minutes) of the shortest path from
+                start_station_names[i] to end_station_names[j], None if one of them does not exist or if
+                end_station_names[j] cannot be reached
+        """
+
+        matrix = []
+        for start_station_name in start_station_names:
+            durations = self.get_durations_from(start_station_name, end_station_names)
+            matrix.append([durations[end_station_name] for end_station_name in end_station_names])
+
+        return matrix
+
+    def search_from(self, start_station_name, end_station_names):
+        """ Runs Dijkstra's algorithm from a station until all the given end stations have been visited
+
+        Args:
+            start_station_name (str): name of the starting station
+            end_station_names (list): names of the ending stations, the ones which do not exist are ignored
+
+        Returns:
+            path_dict (dict) : keeps a history of the connection leading to each station reached (by name, as
+                written in the TubeMap), empty if start_station_name does not exist
+            tentative_distance (dict) : keeps a count of the 'distance' each station reached (by ID) represents
+                from the starting station
+        """
+
+        start_station_obj = self.get_object(start_station_name)
+        if start_station_obj is None:
+            return {}, {}
+
+        end_stations = set()
+        for end_station_name in end_station_names:
+            end_station_obj = self.get_object(end_station_name)
+            if end_station_obj is not None:
+                end_stations.add(end_station_obj.id)
+
+        tentative_distance = {start_station_obj.id: 0}
+        path_dict = {start_station_obj.name: None}
+
+        self.dijkstra_algorithm(start_station_obj.id, end_stations, tentative_distance, self.graph, path_dict)
+
+        return path_dict, tentative_distance
+
+    def get_shortest_path_tree(self, start_station):
+        """ Runs Dijkstra's algorithm from the start station until every reachable station has been visited.
+
+        Args:
+            start_station (str) : ID of the starting station
+
+        Returns:
+            tentative_distance (dict) : key: station ID, value: duration of the shortest path from the start station
+            previous_station (dict) : key: station ID, value: ID of the previous station on ONE shortest path from
+                the start station (None for the start station itself)
+        """
+
+        tentative_distance = {start_station: 0}
+        path_dict = {self.get_name(start_station): None}
+
+        self.dijkstra_algorithm(start_station, None, tentative_distance, self.graph, path_dict)
+
+        previous_station = {}
+        for station_name, previous in path_dict.items():
+            station = self.get_id(station_name)
+            previous_station[station] = None if previous is None else self.get_id(previous[0])
+
+        return tentative_distance, previous_station
+
+    def get_isochrone(self, start_station_names, time_budget):
+        """ Find every station reachable within time_budget minutes from one or several starting stations.
+
+        A single search starts from all the starting stations at once and stops as soon as the closest station left
+        is beyond the budget, so only the stations reached are ever visited.
+
+        Args:
+            start_station_names (str or list): name of the starting station, or names of the starting stations
+            time_budget (int): maximum duration (in minutes) of the journeys
+
+        Returns:
+            isochrone (Isochrone) : arrival time at each station reachable within the budget from the closest
+                starting station (see network.isochrone). Returns None if a starting station does not exist.
+        """
+
+        if isinstance(start_station_names, str):
+            start_station_names = [start_station_names]
+
+        start_stations = []
+        for start_station_name in start_station_names:
+            start_station_obj = self.get_object(start_station_name)
+            if start_station_obj is None:
+                return None
+            start_stations.append(start_station_obj.id)
+
+        arrival_times = self.bounded_search(start_stations, time_budget, self.graph)
+        return Isochrone(self.tubemap, start_stations, time_budget, arrival_times)
+
+    def bounded_search(self, start_stations, time_budget, graph):
+        """ Dijkstra's algorithm from several starting stations at once, stopping at the time budget
+
+        Args:
+            start_stations (list) : IDs of the starting stations
+            time_budget (int) : maximum distance (in minutes) of the stations visited
+            graph (dict) : nested dictionary encoding neighbouring connections between stations
+
+        Returns:
+            arrival_times (dict) : key: ID of a station within the budget, value: its distance from the closest
+                starting station
+        """
+
+        tentative_distance = {station: 0 for station in start_stations}
+        priority_queue = [(0, station) for station in tentative_distance]
+        arrival_times = {}
+
+        while len(priority_queue) > 0:
+            current_distance, current_station = heapq.heappop(priority_queue)
+
+            # Every station left in the queue is beyond the budget
+            if current_distance > time_budget:
+                break
+            if current_station in arrival_times:
+                continue
+            arrival_times[current_station] = current_distance
+
+            for neighbour in graph[current_station]:
+                if neighbour in arrival_times:
+                    continue
+
+                alt, connection_used = self.get_distance(graph, tentative_distance, current_station, neighbour)
+                if alt <= time_budget and alt < tentative_distance.get(neighbour, math.inf):
+                    tentative_distance[neighbour] = alt
+                    heapq.heappush(priority_queue, (alt, neighbour))
+
+        return arrival_times
+
+    def get_csr_graph(self):
+        """ Returns the array-backed graph of the TubeMap, converting it again when the TubeMap has changed
+
+        Returns:
+            csr_graph (CSRGraph) : graph of the TubeMap in CSR format
+        """
+
+        if self.csr_graph is None or self.csr_graph[0] != self.tubemap.version:
+            self.csr_graph = (self.tubemap.version, CSRGraph.build(self.tubemap))
+
+        return self.csr_graph[1]
+
+    def close_connection(self, connection_obj):
+        """ Closes a connection of the TubeMap (see TubeMap.close_connection), keeping the paths it does not affect
+
+        Args:
+            connection_obj (Connection) : connection of the TubeMap to close
+        """
+        self.edit_connection(connection_obj, lambda: self.tubemap.close_connection(connection_obj))
+
+    def reopen_connection(self, connection_obj):
+        """ Reopens a closed connection of the TubeMap (see TubeMap.reopen_connection)
+
+        Args:
+            connection_obj (Connection) : closed connection of the TubeMap to reopen
+        """
+        self.edit_connection(connection_obj, lambda: self.tubemap.reopen_connection(connection_obj))
+
+    def set_connection_time(self, connection_obj, time):
+        """ Changes the time of a connection of the TubeMap (see TubeMap.set_connection_time), keeping the paths
+                it does not affect
+
+        Args:
+            connection_obj (Connection) : connection of the TubeMap
+            time (int) : new time (in minutes) of the connection
+        """
+        self.edit_connection(connection_obj, lambda: self.tubemap.set_connection_time(connection_obj, time))
+
+    def edit_connection(self, connection_obj, edit):
+        """ Edits a connection and invalidates only the cached paths and the precomputed table it affects
+
+        The graph is updated in place by the graph cache. Only the fastest connection between two stations matters,
+        so the edit is compared on the time between the two stations of the connection:
+        - unchanged: no path is affected
+        - longer (closure or delay): only the paths going directly between the two stations may not be the
+          shortest anymore, the other ones are kept
+        - shorter (reopening or speed-up): any path may now be beaten, the cache and the table are dropped
+
+        Args:
+            connection_obj (Connection) : connection edited
+            edit (function) : function making the edit on the TubeMap
+        """
+
+        station_ids = [station_obj.id for station_obj in connection_obj.stations]
+        station_a, station_b = station_ids[0], station_ids[-1]
+
+        old_version = self.tubemap.version
+        old_time = self.get_stations_pair_time(station_a, station_b)
+        table = self.get_table()
+
+        edit()
+
+        new_version = self.tubemap.version
+        new_time = self.get_stations_pair_time(station_a, station_b)
+
+        cache_up_to_date = self.path_cache is not None and self.path_cache.version == old_version
+
+        if new_time < old_time:
+            self.table = None
+            if cache_up_to_date:
+                self.path_cache.check_version(new_version)
+            return
+
+        if new_time > old_time:
+            if cache_up_to_date:
+                self.path_cache.invalidate_stations_pair(station_a, station_b)
+            if table is not None and table.uses_stations_pair(station_a, station_b):
+                table = None
+
+        if cache_up_to_date:
+            self.path_cache.version = new_version
+        if table is not None:
+            # The table is still right for the edited TubeMap
+            table.fingerprint = get_fingerprint(self.tubemap)
+            self.table = (new_version, table)
+
+    def get_stations_pair_time(self, station_a, station_b):
+        """ Computes the time of the fastest connection between two stations
+
+        Args:
+            station_a (str) : ID of the first station
+            station_b (str) : ID of the second station
+
+        Returns:
+            time (int) : time of the fastest connection, math.inf if the stations are not connected
+        """
+
+        if self.backend == "csr":
+            return self.get_csr_graph().get_stations_pair_time(station_a, station_b)
+
+        connections = self.graph[station_a].get(station_b, [])
+        return min([connection_obj.time for connection_obj in connections], default=math.inf)
+
+    def use_graph_file(self, filepath):
+        """ Searches the array-backed graph saved in a file (see CSRGraph.save) instead of converting the graph.
+
+        The file is memory-mapped, so all the processes using the same file share one copy of the graph. It is used
+        until the TubeMap changes, and only with the "csr" backend. The file is only accepted if its fingerprint
+        is the one of the current stations and connections of the TubeMap (see network.csr.get_fingerprint, computed
+        without building any graph), so that a file written for another map, or before connections were closed or
+        delayed, is never used.
+
+        Args:
+            filepath (str) : path of the graph file, written for this TubeMap
+        """
+
+        csr_graph = CSRGraph.load(filepath)
+
+        matches = csr_graph.fingerprint == get_fingerprint(self.tubemap)
+        if not matches:
+            csr_graph.close()
+        assert matches, "The graph file does not match the TubeMap"
+
+        self.csr_graph = (self.tubemap.version, csr_graph)
+
+    def use_table(self, table):
+        """ Answers the next shortest path queries from a precomputed table (see network.table).
+
+        The table is dropped automatically as soon as the TubeMap changes (unless the change cannot affect it, see
+        edit_connection). It is only accepted if it was computed for the current stations and connections of the
+        TubeMap (see network.csr.get_fingerprint).
+
+        Args:
+            table (ShortestPathTable) : table precomputed for this TubeMap, or None to stop using a table
+        """
+
+        if table is None:
+            self.table = None
+            return
+
+        assert table.fingerprint == get_fingerprint(self.tubemap), "The table does not match the TubeMap"
+        self.table = (self.tubemap.version, table)
+
+    def get_table(self):
+        """ Returns the precomputed table in use, if it is still valid for the TubeMap
+
+        Returns:
+            table (ShortestPathTable) : table in use, None if there is none
+        """
+
+        if self.table is None:
+            return None
+
+        if self.table[0] != self.tubemap.version:
+            self.table = None
+            return None
+
+        return self.table[1]
+
+    def bidirectional_algorithm(self, start_station, end_station, graph):
+        """ Bidirectional version of Dijkstra's algorithm, computing the shortest path between the start station and
+                the end station.
+
+        A forward search runs from the start station and a backward search from the end station (the graph is
+        undirected, so both use the same neighbours). The side with the closest station in its queue is expanded
+        first. Each time an edge reaches a station already reached by the other side, the length of the path going
+        through that edge is a candidate for the shortest path. The searches stop as soon as the distances at the
+        top of both queues add up to the best candidate: no path left to discover can be shorter.
+
+        Args:
+            start_station (str) : ID of the starting station
+            end_station (str) : ID of the ending station
+            graph (dict) : nested dictionary encoding neighbouring connections between stations
+
+        Returns:
+            path (list) : IDs of the stations of ONE shortest path from the start station to the end station.
+                Returns None if the end station cannot be reached.
+        """
+
+        if start_station == end_station:
+            return [start_station]
+
+        # Index 0 is the forward search (from the start station), index 1 is the backward search (from the end)
+        tentative_distance = [{start_station: 0}, {end_station: 0}]
+        previous_station = [{start_station: None}, {end_station: None}]
+        visited_stations = [set(), set()]
+        priority_queues = [[(0, start_station)], [(0, end_station)]]
+
+        best_distance = math.inf
+        meeting_edge = None  # (station reached by the forward search, station reached by the backward search)
+
+        while len(priority_queues[0]) > 0 and len(priority_queues[1]) > 0:
+
+            # Standard stopping criterion: every path left would be at least as long as the best one found
+            if priority_queues[0][0][0] + priority_queues[1][0][0] >= best_distance:
+                break
+
+            side = 0 if priority_queues[0][0][0] <= priority_queues[1][0][0] else 1
+            other_side = 1 - side
+
+            current_distance, current_station = heapq.heappop(priority_queues[side])
+            if current_station in visited_stations[side]:
+                continue
+            visited_stations[side].add(current_station)
+
+            for neighbour in graph[current_station]:
+                alt, connection_used = self.get_distance(graph, tentative_distance[side], current_station, neighbour)
+
+                if neighbour not in visited_stations[side] and alt < tentative_distance[side].get(neighbour, math.inf):
+                    tentative_distance[side][neighbour] = alt
+                    previous_station[side][neighbour] = current_station
+                    heapq.heappush(priority_queues[side], (alt, neighbour))
+
+                # The neighbour links both searches: candidate path through the edge (current_station, neighbour)
+                if neighbour in tentative_distance[other_side]:
+                    candidate = alt + tentative_distance[other_side][neighbour]
+                    if candidate < best_distance:
+                        best_distance = candidate
+                        if side == 0:
+                            meeting_edge = (current_station, neighbour)
+                        else:
+                            meeting_edge = (neighbour, current_station)
+
+        if meeting_edge is None:
+            return None
+
+        # Walks back from the meeting edge to both ends
+        path = []
+        station = meeting_edge[0]
+        while station is not None:
+            path.append(station)
+            station = previous_station[0][station]
+        path.reverse()
+
+        station = meeting_edge[1]
+        while station is not None:
+            path.append(station)
+            station = previous_station[1][station]
+
+        return path
+
+    def get_astar_heuristic(self, end_station):
+        """ Builds the A* heuristic leading to the end station.
+
+        The heuristic is the straight-line (chord) distance to the end station divided by the fastest speed observed
+        on a connection of the network. The chord is never longer than the great-circle distance the speed is
+        measured with, so the heuristic never overestimates the remaining travel time, and it satisfies the triangle
+        inequality (it is consistent). Stations without coordinates get a heuristic of 0.
+
+        The heuristic is evaluated each time a station is pushed: the positions of the stations are precomputed
+        (see get_station_vectors), so that it only takes a square root instead of the trigonometry of the haversine
+        formula. A station is pushed about once per query, so the values are not memoised.
+
+        Args:
+            end_station (str) : ID of the ending station
+
+        Returns:
+            heuristic (function) : function giving a lower bound of the time (in minutes) from a station ID to
+                the end station
+        """
+
+        station_vectors = self.get_station_vectors()
+        max_speed = self.get_max_speed()
+        end_vector = station_vectors.get(end_station)
+
+        if end_vector is None or max_speed == math.inf:
+            return lambda station: 0
+
+        end_x, end_y, end_z = end_vector
+        scale = EARTH_RADIUS / max_speed
+
+        def heuristic(station):
+            vector = station_vectors.get(station)
+            if vector is None:
+                return 0
+            x, y, z = vector
+            x, y, z = x - end_x, y - end_y, z - end_z
+            return scale * math.sqrt(x * x + y * y + z * z)
+
+        return heuristic
+
+    def get_station_vectors(self):
+        """ Converts the coordinates of the stations to points of the unit sphere, for the A* heuristic
+                (see get_astar_heuristic).
+
+        The result is kept until the TubeMap changes.
+
+        Returns:
+            station_vectors (dict) : key: station ID, value: (x, y, z) position of the station on the unit sphere.
+                Stations without coordinates are missing.
+        """
+
+        if self.station_vectors is not None and self.station_vectors[0] == self.tubemap.version:
+            return self.station_vectors[1]
+
+        station_vectors = {}
+        for station, (latitude, longitude) in self.tubemap.coordinates.items():
+            latitude, longitude = math.radians(latitude), math.radians(longitude)
+            station_vectors[station] = (math.cos(latitude) * math.cos(longitude),
+                                        math.cos(latitude) * math.sin(longitude), math.sin(latitude))
+
+        self.station_vectors = (self.tubemap.version, station_vectors)
+        return station_vectors
+
+    def get_max_speed(self):
+        """ Computes the fastest speed (in km/min) observed on a connection between two stations with coordinates.
+
+        The result is kept until the TubeMap changes.
+
+        Returns:
+            max_speed (float) : fastest speed observed; math.inf if a connection takes no time between two
+                distinct locations, in which case distances give no lower bound on travel times
+        """
+
+        if self.max_speed is not None and self.max_speed[0] == self.tubemap.version:
+            return self.max_speed[1]
+
+        coordinates = self.tubemap.coordinates
+        max_speed = 0
+        for connection_obj in self.tubemap.connections:
+            station_coordinates = [coordinates.get(station_obj.id) for station_obj in connection_obj.stations]
+            if len(station_coordinates) != 2 or None in station_coordinates:
+                continue
+
+            distance = great_circle_distance(station_coordinates[0], station_coordinates[1])
+            if distance == 0:
+                continue
+            elif connection_obj.time <= 0:
+                max_speed = math.inf
+                break
+            else:
+                max_speed = max(max_speed, distance / connection_obj.time)
+
+        # No usable connection: distances are then no information at all
+        if max_speed == 0:
+            max_speed = math.inf
+
+        self.max_speed = (self.tubemap.version, max_speed)
+        return max_speed
 
     def process(self, path_dict, start_station_name, end_station_name, end_station_obj):
         """ Process the path_dict to make it readable and in the appropriate format
@@ -173,17 +1104,21 @@ class PathFinder:
             alt (int) : the new 'distance' from the starting station reached via the current station
             current_station (Station) : the Station object we are visiting in Dijkstra's algorithm
             connection_used (Connection) :  the Connection object linking the current_station and the neighbour
+
+        Returns:
+            improved (bool) : True if the neighbour is now reached faster through the current station
         """
 
-        if tentative_distance[neighbour] > alt:
+        if tentative_distance.get(neighbour, math.inf) > alt:
             tentative_distance[neighbour] = alt
 
             name_neigh = self.get_name(neighbour)
             name_current = self.get_name(current_station)
             path_dict[name_neigh] = [name_current,
                                      connection_used]
+            return True
         else:
-            pass
+            return False
 
     def get_distance(self, graph, tentative_distance, current_station, neighbour):
         """ Computes the new alternative distance between the neighbour Station and the start station passing through
@@ -229,26 +1164,15 @@ class PathFinder:
             neigh (list) : list of the IDs of the corresponding neighbours
         """
 
-        neigh = []
-        station_obj = self.tubemap.stations[station_id]
-
-        # Works by looking at all Connection objects that include the
-        # station_id and adding the other station to the neigh list
-        for connection in self.tubemap.connections:
-            if station_obj in connection.stations:
-                for neighbouring_station_obj in connection.stations:
-                    if neighbouring_station_obj != station_obj and neighbouring_station_obj.id not in neigh:
-                        neigh.append(neighbouring_station_obj.id)
-                    else:
-                        continue
-            else:
-                continue
+        neigh = list(self.graph[station_id])
 
         return neigh
 
     def get_id(self, station_name_given):
         """ Find the ID of a station given its name
 
+        The name can be written differently from the TubeMap (see get_object).
+
         Args:
             station_name_given (str) : name of the station
 
@@ -258,15 +1182,10 @@ class PathFinder:
 
         assert type(station_name_given) == str, "Wrong input type for get_id function: station name must be a str"
 
-        index = None
-        for station in self.tubemap.stations:
-            station_obj = self.tubemap.stations[station]
-            if station_obj.name == station_name_given:
-                index = station_obj.id
-                break
-            else:
-                continue
-        assert index is not None, "Station name has not been found"
+        station_obj = self.get_object(station_name_given)
+        assert station_obj is not None, "Station name has not been found"
+
+        index = station_obj.id
         return index
 
     def get_name(self, station_id_given):
@@ -280,67 +1199,55 @@ class PathFinder:
 
         assert type(station_id_given) == str, "Wrong input type for get_name function: station id must be a str"
 
-        name = None
-        for station in self.tubemap.stations:
-            station_obj = self.tubemap.stations[station]
-            if station_obj.id == station_id_given:
-                name = station_obj.name
-                break
-            else:
-                continue
-
-        assert name is not None, "ID given has not been found"
+        station_obj = self.tubemap.stations.get(station_id_given)
+        assert station_obj is not None, "ID given has not been found"
 
+        name = station_obj.name
         return name
 
     def get_object(self, station_name_given):
-        """ Find the Station object of a station given its ID
+        """ Find the Station object of a station given its name
+
+        A name which is not found exactly is looked up in the name index of the TubeMap, which matches names written
+        differently (case, punctuation, "St"/"Street", see tube.names). Every method taking station names goes
+        through this lookup.
+
         Args:
             station_name_given (str) : name of the station
 
         Returns:
-            object (Station) : Corresponding object of the station
+            object (Station) : Corresponding object of the station, None if there is none
         """
 
         assert type(station_name_given) == str, "Wrong input type for get_object function: " \
                                                 "station_name_given must be a str"
 
-        obj = None
-        for station in self.tubemap.stations:
-            station_obj = self.tubemap.stations[station]
-            if station_obj.name == station_name_given:
-                obj = station_obj
-                break
-            else:
-                continue
+        obj = self.tubemap.stations_by_name.get(station_name_given)
+        if obj is None:
+            obj = self.tubemap.stations_by_name.get(self.tubemap.name_index.get_exact(station_name_given))
 
         return obj
 
-    def get_lowest_value_station(self, unvisited_stations, tentative_distance):
-        """ Find the name of a station given its ID
 
-        Args:
-            unvisited_stations (set) : set of ID (str) of the stations that have not been visited yet
-            tentative_distance (dict) : dict of the distances of each station, which is constantly updating
+def great_circle_distance(coordinates_a, coordinates_b):
+    """ Computes the great-circle distance between two points with the haversine formula
 
-        Returns:
-            lowest_value_station_id (str) : ID of the station with the lowest distance in values
-                of the tentative_distance dict
-        """
+    Args:
+        coordinates_a (tuple) : (latitude, longitude) of the first point, in degrees
+        coordinates_b (tuple) : (latitude, longitude) of the second point, in degrees
 
-        assert type(unvisited_stations) == set, "Wrong input type for get_lowest_value_station function: " \
-                                                "unvisited_stations must be a list"
-        assert type(tentative_distance) == dict, "Wrong input type for get_lowest_value_station: " \
-                                                 "tentative_distance must be a dict"
+    Returns:
+        distance (float) : distance between the two points, in km
+    """
 
-        possible_stations_to_choose_from = {}
-        for unvisited_station in unvisited_stations:
-            possible_stations_to_choose_from[unvisited_station] = tentative_distance[unvisited_station]
+    latitude_a, longitude_a = map(math.radians, coordinates_a)
+    latitude_b, longitude_b = map(math.radians, coordinates_b)
 
-        lowest_value_station_id = min(possible_stations_to_choose_from,
-                                      key=possible_stations_to_choose_from.get)
+    haversine = (math.sin((latitude_b - latitude_a) / 2) ** 2 +
+                 math.cos(latitude_a) * math.cos(latitude_b) * math.sin((longitude_b - longitude_a) / 2) ** 2)
 
-        return lowest_value_station_id
+    distance = 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(haversine)))
+    return distance
 
 
 def test_shortest_path():
@@ -357,5 +1264,186 @@ def test_shortest_path():
     assert station_names == expected
 
 
+def test_k_shortest_paths():
+    from tube.map import TubeMap
+    tubemap = TubeMap()
+    tubemap.import_from_json("data/london.json")
+
+    path_finder = PathFinder(tubemap)
+    paths = path_finder.get_k_shortest_paths("Stockwell", "South Kensington", k=3)
+
+    assert len(paths) == 3
+    assert [station.name for station in paths[0][1]] == \
+        [station.name for station in path_finder.get_shortest_path("Stockwell", "South Kensington")]
+
+    durations = [duration for duration, stations in paths]
+    assert durations == sorted(durations)
+    for duration, stations in paths:
+        assert len(set(stations)) == len(stations)
+        assert stations[0].name == "Stockwell" and stations[-1].name == "South Kensington"
+
+    assert path_finder.get_k_shortest_paths("Stockwell", "Nowhere") is None
+
+
+def check_algorithm(algorithm):
+    from tube.map import TubeMap
+    tubemap = TubeMap()
+    tubemap.import_from_json("data/london.json")
+
+    path_finder = PathFinder(tubemap)
+    names = sorted(tubemap.stations_by_name)
+    start_station_names = names[::30]
+    for start_station_name in start_station_names:
+        durations = path_finder.get_durations_from(start_station_name, names)
+        for end_station_name in names:
+            stations = path_finder.get_shortest_path(start_station_name, end_station_name, algorithm)
+            assert stations[0].name == start_station_name and stations[-1].name == end_station_name
+            duration = sum(path_finder.get_stations_pair_time(station_a.id, station_b.id)
+                           for station_a, station_b in zip(stations, stations[1:]))
+            assert duration == durations[end_station_name], (algorithm, start_station_name, end_station_name)
+
+    stations = path_finder.get_shortest_path("Green Park", "Green Park", algorithm)
+    assert [station.name for station in stations] == ["Green Park"]
+    assert path_finder.get_shortest_path("Green Park", "Nowhere", algorithm) is None
+
+
+def test_astar():
+    check_algorithm("astar")
+
+
+def test_bidirectional():
+    check_algorithm("bidirectional")
+
+
+def test_batch_queries():
+    from tube.map import TubeMap
+    tubemap = TubeMap()
+    tubemap.import_from_json("data/london.json")
+
+    path_finder = PathFinder(tubemap)
+    start_station_names = ["Covent Garden", "Stockwell", "Upminster"]
+    end_station_names = ["Green Park", "South Kensington", "Covent Garden", "Nowhere"]
+
+    def get_duration(stations):
+        return sum(path_finder.get_stations_pair_time(station_a.id, station_b.id)
+                   for station_a, station_b in zip(stations, stations[1:]))
+
+    matrix = path_finder.get_duration_matrix(start_station_names + ["Nowhere"], end_station_names)
+    for i, start_station_name in enumerate(start_station_names):
+        paths = path_finder.get_shortest_paths_from(start_station_name, end_station_names)
+        durations = path_finder.get_durations_from(start_station_name, end_station_names)
+        assert paths["Nowhere"] is None and durations["Nowhere"] is None and matrix[i][-1] is None
+
+        for j, end_station_name in enumerate(end_station_names[:-1]):
+            stations = path_finder.get_shortest_path(start_station_name, end_station_name)
+            assert [station.name for station in paths[end_station_name]] == [station.name for station in stations]
+            assert durations[end_station_name] == matrix[i][j] == get_duration(stations)
+
+    assert matrix[-1] == [None] * len(end_station_names)
+    assert path_finder.get_shortest_paths_from("Nowhere", ["Green Park"]) == {"Green Park": None}
+    assert path_finder.get_durations_from("Nowhere", ["Green Park"]) == {"Green Park": None}
+
+
+def test_station_name_lookup():
+    from tube.map import TubeMap
+    tubemap = TubeMap()
+    tubemap.import_from_json("data/london.json")
+
+    path_finder = PathFinder(tubemap)
+    stations = path_finder.get_shortest_path("covent garden", "GREEN PARK")
+    assert [station.name for station in stations] == ["Covent Garden", "Leicester Square", "Piccadilly Circus",
+                                                      "Green Park"]
+
+    stations = path_finder.get_shortest_path("Baker St", "St Jamess Park")
+    assert (stations[0].name, stations[-1].name) == ("Baker Street", "St. James's Park")
+
+    # Every method taking station names accepts the same spellings
+    duration = path_finder.get_durations_from("Baker Street", ["St. James's Park"])["St. James's Park"]
+    assert path_finder.get_durations_from("baker st", ["St Jamess Park"]) == {"St Jamess Park": duration}
+    assert path_finder.get_duration_matrix(["BAKER STREET"], ["st jamess park"]) == [[duration]]
+    paths = path_finder.get_shortest_paths_from("baker st", ["St Jamess Park", "Nowhere"])
+    assert [station.name for station in paths["St Jamess Park"]] == [station.name for station in stations]
+    assert paths["Nowhere"] is None
+    assert path_finder.get_k_shortest_paths("baker st", "St Jamess Park", k=2)[0][0] == duration
+    assert path_finder.get_journey("baker st", "St Jamess Park") is not None
+    assert path_finder.get_shortest_path_in_zones("baker st", "St Jamess Park", [1]) is not None
+    assert path_finder.get_pareto_journeys("baker st", "St Jamess Park")[0][0] == duration
+    assert path_finder.get_isochrone("baker st", 10).arrival_times[path_finder.get_id("Baker Street")] == 0
+
+
+def test_edit_connections():
+    from network.table import ShortestPathTable
+    from tube.map import TubeMap
+
+    def import_tubemap():
+        tubemap = TubeMap()
+        tubemap.import_from_json("data/london.json")
+        return tubemap
+
+    def get_connection(tubemap, station_a_name, station_b_name, line_name):
+        for connection_obj in tubemap.connections + tubemap.closed_connections:
+            if {station_obj.name for station_obj in connection_obj.stations} == {station_a_name, station_b_name} \
+                    and connection_obj.line.name == line_name:
+                return connection_obj
+
+    def check_queries(path_finder, reference_path_finder, pairs):
+        # The paths found after the edit are as fast as the ones found from scratch on a map with the same edit
+        reference_graph = reference_path_finder.graph
+        for start_station_name, end_station_name in pairs:
+            stations = path_finder.get_shortest_path(start_station_name, end_station_name)
+            duration = sum(min(connection_obj.time for connection_obj in reference_graph[station_a.id][station_b.id])
+                           for station_a, station_b in zip(stations, stations[1:]))
+            expected = reference_path_finder.get_durations_from(start_station_name, [end_station_name])
+            assert duration == expected[end_station_name], (start_station_name, end_station_name)
+
+    tubemap = import_tubemap()
+    path_finder = PathFinder(tubemap, cache_size=1000)
+    table = ShortestPathTable.build(path_finder)
+    path_finder.use_table(table)
+
+    names = sorted(tubemap.stations_by_name)
+    pairs = [("Covent Garden", "Green Park"), ("Stockwell", "South Kensington")]
+    pairs += [(names[index], names[(index * 7 + 3) % len(names)]) for index in range(0, len(names), 5)]
+    for start_station_name, end_station_name in pairs:
+        path_finder.get_shortest_path(start_station_name, end_station_name)
+    cache_size = path_finder.path_cache.get_statistics()["size"]
+
+    # A delay on a connection slower than another connection between the same stations keeps the cache and the table
+    path_finder.set_connection_time(get_connection(tubemap, "Barons Court", "Hammersmith", "Piccadilly Line"), 7)
+    assert path_finder.get_table() is table
+    assert path_finder.path_cache.get_statistics()["size"] == cache_size
+
+    # A delay on a connection used by some paths only drops these paths, and the table using it
+    delayed_connection = get_connection(tubemap, "Piccadilly Circus", "Green Park", "Piccadilly Line")
+    path_finder.set_connection_time(delayed_connection, 10)
+    assert path_finder.get_table() is None
+    assert 0 < path_finder.path_cache.get_statistics()["size"] < cache_size
+    assert path_finder.path_cache.get(path_finder.get_id("Covent Garden"), path_finder.get_id("Green Park"),
+                                      tubemap.version) is None
+
+    reference_tubemap = import_tubemap()
+    reference_tubemap.set_connection_time(get_connection(reference_tubemap, "Barons Court", "Hammersmith",
+                                                         "Piccadilly Line"), 7)
+    reference_tubemap.set_connection_time(get_connection(reference_tubemap, "Piccadilly Circus", "Green Park",
+                                                         "Piccadilly Line"), 10)
+    check_queries(path_finder, PathFinder(reference_tubemap), pairs)
+
+    # Closing and reopening a connection
+    closed_connection = get_connection(tubemap, "Vauxhall", "Pimlico", "Victoria Line")
+    path_finder.close_connection(closed_connection)
+    reference_tubemap.close_connection(get_connection(reference_tubemap, "Vauxhall", "Pimlico", "Victoria Line"))
+    check_queries(path_finder, PathFinder(reference_tubemap), pairs)
+
+    path_finder.reopen_connection(closed_connection)
+    reference_tubemap.reopen_connection(get_connection(reference_tubemap, "Vauxhall", "Pimlico", "Victoria Line"))
+    check_queries(path_finder, PathFinder(reference_tubemap), pairs)
+
+
 if __name__ == "__main__":
     test_shortest_path()
+    test_k_shortest_paths()
+    test_astar()
+    test_bidirectional()
+    test_batch_queries()
+    test_station_name_lookup()
+    test_edit_connections()
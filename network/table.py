@@ -0,0 +1,235 @@
+from array import array
+import struct
+import sys
+
+from network.csr import get_fingerprint
+
+MAGIC = b"APSP"
+FORMAT_VERSION = 2
+# magic, format version, array typecode, number of stations, fingerprint of the TubeMap (see network.csr)
+HEADER = struct.Struct("<4sBcI32s")
+
+
+class ShortestPathTable:
+    """ Precomputed table of the shortest paths between all the pairs of stations of a TubeMap.
+
+    The stations are numbered from 0 to n - 1 (in the order of `station_ids`) and the table is made of two n x n
+    matrices stored row by row in flat arrays:
+    - distances[i * n + j] is the duration of the shortest path from station i to station j (-1 if unreachable)
+    - next_hops[i * n + j] is the number of the station following station i on ONE shortest path from station i
+      to station j (-1 if i == j or if j is unreachable)
+
+    Both matrices use 16 bits integers when the network is small enough (such as the London network), 32 bits
+    integers otherwise. A shortest path query is then a walk along the next hops, without any search.
+
+    The table keeps the fingerprint of the stations and connections of the TubeMap it was computed for
+    (see network.csr.get_fingerprint), so that it is never used for a TubeMap with other connections or times.
+    """
+
+    def __init__(self, station_ids, distances, next_hops, fingerprint):
+        """
+        Args:
+            station_ids (list) : IDs (str) of the stations, in the order of the rows and columns of the matrices
+            distances (array) : flat distance matrix
+            next_hops (array) : flat next hop matrix
+            fingerprint (bytes) : fingerprint of the TubeMap the table was computed for
+        """
+        self.station_ids = station_ids
+        self.station_indexes = {station: index for index, station in enumerate(station_ids)}
+        self.distances = distances
+        self.next_hops = next_hops
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def build(cls, path_finder):
+        """ Computes the table by running one complete Dijkstra search per station
+
+        Args:
+            path_finder (PathFinder) : path finder of the TubeMap to precompute
+
+        Returns:
+            table (ShortestPathTable) : table of all the shortest paths of the TubeMap
+        """
+
+        station_ids = list(path_finder.tubemap.stations)
+        station_indexes = {station: index for index, station in enumerate(station_ids)}
+        n = len(station_ids)
+
+        # The graph is undirected: in the shortest path tree rooted at station j, the parent of station i
+        # is the next hop from station i towards station j
+        columns = []
+        max_value = n
+        for station in station_ids:
+            tentative_distance, previous_station = path_finder.get_shortest_path_tree(station)
+            columns.append((tentative_distance, previous_station))
+            max_value = max([max_value] + list(tentative_distance.values()))
+
+        typecode = "h" if max_value < 2 ** 15 else "i"
+        distances = array(typecode, [-1]) * (n * n)
+        next_hops = array(typecode, [-1]) * (n * n)
+
+        for j, (tentative_distance, previous_station) in enumerate(columns):
+            for station, distance in tentative_distance.items():
+                i = station_indexes[station]
+                distances[i * n + j] = distance
+                if previous_station[station] is not None:
+                    next_hops[i * n + j] = station_indexes[previous_station[station]]
+
+        return cls(station_ids, distances, next_hops, get_fingerprint(path_finder.tubemap))
+
+    def get_duration(self, start_station, end_station):
+        """ Reads the duration of the shortest path between two stations
+
+        Args:
+            start_station (str) : ID of the starting station
+            end_station (str) : ID of the ending station
+
+        Returns:
+            duration (int) : duration of the shortest path, None if the end station cannot be reached
+        """
+
+        n = len(self.station_ids)
+        distance = self.distances[self.station_indexes[start_station] * n + self.station_indexes[end_station]]
+
+        return None if distance < 0 else distance
+
+    def get_path(self, start_station, end_station):
+        """ Walks the next hops from the start station to the end station
+
+        Args:
+            start_station (str) : ID of the starting station
+            end_station (str) : ID of the ending station
+
+        Returns:
+            path (list) : IDs of the stations of ONE shortest path, None if the end station cannot be reached
+        """
+
+        if self.get_duration(start_station, end_station) is None:
+            return None
+
+        n = len(self.station_ids)
+        current = self.station_indexes[start_station]
+        end = self.station_indexes[end_station]
+
+        path = [start_station]
+        while current != end:
+            current = self.next_hops[current * n + end]
+            path.append(self.station_ids[current])
+
+        return path
+
+    def uses_stations_pair(self, station_a, station_b):
+        """ Checks whether a path of the table goes directly from one station to the other
+
+        Args:
+            station_a (str) : ID of the first station
+            station_b (str) : ID of the second station
+
+        Returns:
+            used (bool) : True if the next hop from one of the stations towards some station is the other one
+        """
+
+        n = len(self.station_ids)
+        index_a = self.station_indexes[station_a]
+        index_b = self.station_indexes[station_b]
+
+        for j in range(n):
+            if self.next_hops[index_a * n + j] == index_b or self.next_hops[index_b * n + j] == index_a:
+                return True
+
+        return False
+
+    def save(self, filepath):
+        """ Writes the table to a binary file
+
+        The file is made of a header (magic bytes, format version, typecode, number of stations and fingerprint of
+        the TubeMap), the station IDs (each one prefixed by its length) and the two matrices, as little-endian integers.
+
+        Args:
+            filepath (str) : path of the file to write
+        """
+
+        distances = self.distances
+        next_hops = self.next_hops
+        if sys.byteorder == "big":
+            distances = array(distances.typecode, distances)
+            distances.byteswap()
+            next_hops = array(next_hops.typecode, next_hops)
+            next_hops.byteswap()
+
+        with open(filepath, "wb") as tablefile:
+            tablefile.write(HEADER.pack(MAGIC, FORMAT_VERSION, self.distances.typecode.encode(),
+                                        len(self.station_ids), self.fingerprint))
+            for station in self.station_ids:
+                encoded_station = station.encode("utf-8")
+                tablefile.write(struct.pack("<H", len(encoded_station)))
+                tablefile.write(encoded_station)
+            distances.tofile(tablefile)
+            next_hops.tofile(tablefile)
+
+    @classmethod
+    def load(cls, filepath):
+        """ Reads a table written by `save`
+
+        Args:
+            filepath (str) : path of the file to read
+
+        Returns:
+            table (ShortestPathTable) : the table stored in the file
+        """
+
+        with open(filepath, "rb") as tablefile:
+            magic, format_version, typecode, n, fingerprint = HEADER.unpack(tablefile.read(HEADER.size))
+            assert magic == MAGIC and format_version == FORMAT_VERSION, "Not a shortest path table file"
+
+            station_ids = []
+            for _ in range(n):
+                length, = struct.unpack("<H", tablefile.read(2))
+                station_ids.append(tablefile.read(length).decode("utf-8"))
+
+            distances = array(typecode.decode())
+            distances.fromfile(tablefile, n * n)
+            next_hops = array(typecode.decode())
+            next_hops.fromfile(tablefile, n * n)
+
+        if sys.byteorder == "big":
+            distances.byteswap()
+            next_hops.byteswap()
+
+        return cls(station_ids, distances, next_hops, fingerprint)
+
+
+def test_table():
+    import os
+    import tempfile
+    from network.path import PathFinder
+    from tube.map import TubeMap
+    tubemap = TubeMap()
+    tubemap.import_from_json("data/london.json")
+
+    path_finder = PathFinder(tubemap)
+    table = ShortestPathTable.build(path_finder)
+
+    filepath = os.path.join(tempfile.mkdtemp(), "london.apsp")
+    table.save(filepath)
+    print(f"{filepath}: {os.path.getsize(filepath)} bytes")
+
+    path_finder.use_table(ShortestPathTable.load(filepath))
+    stations = path_finder.get_shortest_path("Covent Garden", "Green Park")
+
+    station_names = [station.name for station in stations]
+    expected = ["Covent Garden", "Leicester Square", "Piccadilly Circus",
+                "Green Park"]
+    assert station_names == expected
+
+    # A table computed before a connection changed is refused
+    tubemap.set_connection_time(tubemap.connections[0], tubemap.connections[0].time + 5)
+    try:
+        path_finder.use_table(ShortestPathTable.load(filepath))
+        assert False, "An outdated table should be refused"
+    except AssertionError as error:
+        assert str(error) == "The table does not match the TubeMap"
+
+
+if __name__ == "__main__":
+    test_table()
@@ -0,0 +1,159 @@
+import numpy as np
+
+from network.csr import CSRGraph
+
+UNREACHABLE = -1
+
+
+class VectorizedDistances:
+    """ Computes the durations of the shortest paths from many stations at once with NumPy.
+
+    The distances from all the sources are kept in one (sources x stations) matrix, and all the connections are
+    relaxed at once with a batched Bellman-Ford step (a min-plus product restricted to the connections):
+    - every connection u -> v proposes distance[:, u] + time for station v
+    - the proposals are grouped by station v (the connections are sorted by v) and reduced with np.minimum.reduceat
+    The step is repeated until no distance changes, which takes as many array passes as the largest number of
+    connections on a shortest path, instead of one Python-level Dijkstra search per source.
+
+    This module requires NumPy, unlike the rest of the package.
+    """
+
+    def __init__(self, csr_graph):
+        """
+        Args:
+            csr_graph (CSRGraph) : graph of the TubeMap in CSR format (see network.csr)
+        """
+        self.station_ids = csr_graph.station_ids
+        self.station_indexes = csr_graph.station_indexes
+
+        offsets = np.frombuffer(csr_graph.offsets, dtype=np.int32)
+        targets = np.frombuffer(csr_graph.targets, dtype=np.int32)
+        weights = np.frombuffer(csr_graph.weights, dtype=np.int32)
+        sources = np.repeat(np.arange(len(self.station_ids), dtype=np.int32), np.diff(offsets))
+
+        # Connections sorted by the station they reach, so that the proposals for a station are contiguous
+        order = np.argsort(targets, kind="stable")
+        self.edge_sources = sources[order]
+        self.edge_weights = weights[order]
+        self.reached_stations, self.group_starts = np.unique(targets[order], return_index=True)
+
+    @classmethod
+    def build(cls, tubemap):
+        """ Prepares the connection arrays of a TubeMap
+
+        Args:
+            tubemap (TubeMap) : tube map to compute durations on
+
+        Returns:
+            vectorized_distances (VectorizedDistances) : engine for the TubeMap
+        """
+        return cls(CSRGraph.build(tubemap))
+
+    def get_distances(self, start_stations, chunk_size=256):
+        """ Computes the durations of the shortest paths from each start station to every station
+
+        Args:
+            start_stations (list) : IDs (str) of the starting stations
+            chunk_size (int) : number of starting stations processed together, to bound the memory used by the
+                (starting stations x connections) proposals
+
+        Returns:
+            distances (numpy.ndarray) : int32 matrix, distances[i, j] is the duration of the shortest path from
+                start_stations[i] to the station self.station_ids[j], UNREACHABLE (-1) if there is none
+        """
+
+        distances = np.empty((len(start_stations), len(self.station_ids)), dtype=np.int32)
+
+        for chunk_start in range(0, len(start_stations), chunk_size):
+            chunk = start_stations[chunk_start:chunk_start + chunk_size]
+            distances[chunk_start:chunk_start + len(chunk)] = self.relax(chunk)
+
+        return distances
+
+    def relax(self, start_stations):
+        """ Runs the batched Bellman-Ford relaxation for a chunk of starting stations
+
+        Args:
+            start_stations (list) : IDs (str) of the starting stations
+
+        Returns:
+            distances (numpy.ndarray) : int32 matrix of the durations, UNREACHABLE (-1) where there is no path
+        """
+
+        # Large enough to never be reached by a path, small enough for the sums not to overflow
+        infinity = np.iinfo(np.int32).max // 4
+
+        distances = np.full((len(start_stations), len(self.station_ids)), infinity, dtype=np.int32)
+        rows = np.arange(len(start_stations))
+        distances[rows, [self.station_indexes[station] for station in start_stations]] = 0
+
+        if len(self.edge_sources) > 0:
+            while True:
+                proposals = distances[:, self.edge_sources] + self.edge_weights
+                best_proposals = np.minimum.reduceat(proposals, self.group_starts, axis=1)
+
+                current = distances[:, self.reached_stations]
+                improved = best_proposals < current
+                if not improved.any():
+                    break
+                distances[:, self.reached_stations] = np.where(improved, best_proposals, current)
+
+        distances[distances >= infinity] = UNREACHABLE
+        return distances
+
+    def get_duration_matrix(self, tubemap, start_station_names, end_station_names):
+        """ Same as PathFinder.get_duration_matrix, computed with array passes
+
+        Args:
+            tubemap (TubeMap) : tube map the engine was built for, used to look the station names up
+            start_station_names (list): names of the starting stations
+            end_station_names (list): names of the ending stations
+
+        Returns:
+            matrix (list) : matrix[i][j] is the duration (in minutes) of the shortest path from
+                start_station_names[i] to end_station_names[j], None if one of them does not exist or if
+                end_station_names[j] cannot be reached
+        """
+
+        start_stations = [tubemap.stations_by_name.get(name) for name in start_station_names]
+        end_stations = [tubemap.stations_by_name.get(name) for name in end_station_names]
+
+        known_start_stations = [station_obj.id for station_obj in start_stations if station_obj is not None]
+        distances = self.get_distances(known_start_stations)
+
+        matrix = []
+        row = 0
+        for start_station_obj in start_stations:
+            if start_station_obj is None:
+                matrix.append([None] * len(end_stations))
+                continue
+
+            durations = []
+            for end_station_obj in end_stations:
+                if end_station_obj is None:
+                    durations.append(None)
+                else:
+                    distance = int(distances[row, self.station_indexes[end_station_obj.id]])
+                    durations.append(None if distance == UNREACHABLE else distance)
+            matrix.append(durations)
+            row += 1
+
+        return matrix
+
+
+def test_vectorized():
+    from network.path import PathFinder
+    from tube.map import TubeMap
+    tubemap = TubeMap()
+    tubemap.import_from_json("data/london.json")
+
+    names = sorted(tubemap.stations_by_name)
+    vectorized_distances = VectorizedDistances.build(tubemap)
+    matrix = vectorized_distances.get_duration_matrix(tubemap, names, names)
+
+    path_finder = PathFinder(tubemap)
+    assert matrix == path_finder.get_duration_matrix(names, names)
+
+
+if __name__ == "__main__":
+    test_vectorized()
@@ -0,0 +1,282 @@
+import heapq
+import math
+
+
+def get_zones_crossed(station_a, station_b):
+    """ Counts the zone boundaries crossed when travelling directly between two stations
+
+    A station may belong to two zones: no boundary is crossed between two stations sharing a zone, otherwise the
+    number of boundaries crossed is the smallest difference between a zone of each station.
+
+    Args:
+        station_a (Station) : first station
+        station_b (Station) : second station
+
+    Returns:
+        zones_crossed (int) : number of zone boundaries crossed (0 if a station has no zone)
+    """
+
+    if len(station_a.zones) == 0 or len(station_b.zones) == 0:
+        return 0
+
+    return min(abs(zone_a - zone_b) for zone_a in station_a.zones for zone_b in station_b.zones)
+
+
+class ZoneRouter:
+    """ Routing with the zones of the stations, used by PathFinder.get_shortest_path_in_zones and
+    PathFinder.get_pareto_journeys.
+
+    The multi-criteria search runs on the (station, line) states of a LineGraph (see network.lines), so that both
+    the zone boundaries crossed and the changes of line can be counted. For each ride of the LineGraph, the number
+    of zone boundaries crossed is computed once, when the router is built:
+    - zones_crossed: for each state, number of zone boundaries crossed by each of its rides (in the same order as
+      line_graph.rides)
+    """
+
+    def __init__(self, stations, line_graph):
+        """
+        Args:
+            stations (dict) : key: station ID, value: Station object (see TubeMap.stations)
+            line_graph (LineGraph) : (station, line) graph of the same TubeMap
+        """
+        self.stations = stations
+        self.line_graph = line_graph
+
+        self.zones_crossed = []
+        for state, rides in enumerate(line_graph.rides):
+            station_obj = stations[line_graph.states[state][0]]
+            self.zones_crossed.append([get_zones_crossed(station_obj, stations[line_graph.states[next_state][0]])
+                                       for next_state, connection_obj in rides])
+
+    def get_path(self, graph, start_station, end_station, zones):
+        """ Searches ONE shortest path between two stations, only going through stations of the given zones
+
+        A station belonging to two zones may be used if one of them is allowed.
+
+        Args:
+            graph (dict) : nested dictionary encoding neighbouring connections between stations
+            start_station (str) : ID of the starting station
+            end_station (str) : ID of the ending station
+            zones (set) : numbers of the zones allowed
+
+        Returns:
+            path (list) : IDs of the stations of ONE shortest path in the zones, None if there is none
+        """
+
+        def is_allowed(station):
+            return not self.stations[station].zones.isdisjoint(zones)
+
+        if not is_allowed(start_station) or not is_allowed(end_station):
+            return None
+
+        tentative_distance = {start_station: 0}
+        previous_station = {start_station: None}
+        visited_stations = set()
+        priority_queue = [(0, start_station)]
+
+        while len(priority_queue) > 0:
+            current_distance, current_station = heapq.heappop(priority_queue)
+            if current_station in visited_stations:
+                continue
+            visited_stations.add(current_station)
+
+            if current_station == end_station:
+                path = []
+                while current_station is not None:
+                    path.append(current_station)
+                    current_station = previous_station[current_station]
+                path.reverse()
+                return path
+
+            for neighbour, connections in graph[current_station].items():
+                if neighbour in visited_stations or not is_allowed(neighbour):
+                    continue
+
+                alt = current_distance + min(connection_obj.time for connection_obj in connections)
+                if alt < tentative_distance.get(neighbour, math.inf):
+                    tentative_distance[neighbour] = alt
+                    previous_station[neighbour] = current_station
+                    heapq.heappush(priority_queue, (alt, neighbour))
+
+        return None
+
+    def get_pareto_journeys(self, graph, start_station, end_station):
+        """ Searches the journeys between two stations which are Pareto-optimal for (duration, zone boundaries
+                crossed, changes of line)
+
+        A journey is Pareto-optimal if no other journey is at least as good on the three criteria and better on one.
+        The search is a multi-criteria version of A* on the states of the LineGraph: each state keeps a set of
+        labels (duration, zones crossed, changes) instead of a single distance. The labels are popped from a priority
+        queue in lexicographic order of (duration + lower bound of the remaining duration, zones crossed, changes),
+        the lower bounds being the exact durations to the end station computed by one search on the graph.
+
+        A label is pruned as soon as it is dominated (no better on any criterion) by a label already kept at the same
+        state, or when, with the lower bound of its remaining duration, it is dominated by a journey already found:
+        the three criteria can only grow along a journey.
+
+        Args:
+            graph (dict) : nested dictionary encoding neighbouring connections between stations
+            start_station (str) : ID of the starting station
+            end_station (str) : ID of the ending station
+
+        Returns:
+            journeys (list) : for each Pareto-optimal journey, sorted by duration, a tuple (duration, zones crossed,
+                changes, station IDs, connections), where connections are the Connection instances ridden in order
+        """
+
+        if start_station == end_station:
+            return [(0, 0, 0, [start_station], [])]
+
+        line_graph = self.line_graph
+        states = line_graph.states
+        remaining_duration = get_durations_to(graph, end_station)
+        if start_station not in remaining_duration:
+            return []
+
+        kept_labels = {}  # key: state number, value: list of the (duration, zones, changes) kept at the state
+        end_labels = []  # (duration, zones, changes) of the journeys found
+        end_journeys = []  # number of the last label of each journey found
+
+        # Labels are (duration, zones, changes, state, number of the label it extends, Connection ridden or None)
+        labels = []
+        priority_queue = []
+        for state in line_graph.station_states[start_station]:
+            labels.append((0, 0, 0, state, None, None))
+            priority_queue.append((remaining_duration[start_station], 0, 0, len(labels) - 1))
+        heapq.heapify(priority_queue)
+
+        while len(priority_queue) > 0:
+            estimate, zones, changes, label = heapq.heappop(priority_queue)
+            duration, state = labels[label][0], labels[label][3]
+
+            if is_dominated((estimate, zones, changes), end_labels) or \
+                    is_dominated((duration, zones, changes), kept_labels.get(state, ())):
+                continue
+            kept_labels.setdefault(state, []).append((duration, zones, changes))
+
+            current_station = states[state][0]
+            if current_station == end_station:
+                end_labels.append((duration, zones, changes))
+                end_journeys.append(label)
+                continue
+
+            moves = [(next_state, duration + connection_obj.time, zones + zones_crossed, changes, connection_obj)
+                     for (next_state, connection_obj), zones_crossed
+                     in zip(line_graph.rides[state], self.zones_crossed[state])]
+            moves += [(next_state, duration, zones, changes + 1, None)
+                      for next_state in line_graph.station_states[current_station] if next_state != state]
+
+            for next_state, next_duration, next_zones, next_changes, connection_obj in moves:
+                next_station = states[next_state][0]
+                if next_station not in remaining_duration:
+                    continue
+
+                next_estimate = next_duration + remaining_duration[next_station]
+                if is_dominated((next_estimate, next_zones, next_changes), end_labels) or \
+                        is_dominated((next_duration, next_zones, next_changes), kept_labels.get(next_state, ())):
+                    continue
+
+                labels.append((next_duration, next_zones, next_changes, next_state, label, connection_obj))
+                heapq.heappush(priority_queue, (next_estimate, next_zones, next_changes, len(labels) - 1))
+
+        journeys = []
+        for label in end_journeys:
+            duration, zones, changes = labels[label][:3]
+
+            # Walks back from the last label, keeping the rides only (changes of line stay at the same station)
+            stations = [line_graph.states[labels[label][3]][0]]
+            connections = []
+            while labels[label][4] is not None:
+                connection_obj = labels[label][5]
+                label = labels[label][4]
+                if connection_obj is not None:
+                    connections.append(connection_obj)
+                    stations.append(line_graph.states[labels[label][3]][0])
+            stations.reverse()
+            connections.reverse()
+
+            journeys.append((duration, zones, changes, stations, connections))
+
+        return journeys
+
+
+def get_durations_to(graph, end_station):
+    """ Computes the duration of the shortest path from every station to the end station (the graph is undirected)
+
+    Args:
+        graph (dict) : nested dictionary encoding neighbouring connections between stations
+        end_station (str) : ID of the ending station
+
+    Returns:
+        durations (dict) : key: ID of a station which can reach the end station, value: duration of its shortest
+            path to the end station
+    """
+
+    durations = {}
+    tentative_distance = {end_station: 0}
+    priority_queue = [(0, end_station)]
+
+    while len(priority_queue) > 0:
+        current_distance, current_station = heapq.heappop(priority_queue)
+        if current_station in durations:
+            continue
+        durations[current_station] = current_distance
+
+        for neighbour, connections in graph[current_station].items():
+            if neighbour in durations:
+                continue
+            alt = current_distance + min(connection_obj.time for connection_obj in connections)
+            if alt < tentative_distance.get(neighbour, math.inf):
+                tentative_distance[neighbour] = alt
+                heapq.heappush(priority_queue, (alt, neighbour))
+
+    return durations
+
+
+def is_dominated(criteria, kept_criteria):
+    """ Checks whether some criteria are dominated by (no better than) one of the criteria kept
+
+    Args:
+        criteria (tuple) : (duration, zones crossed, changes), the lower the better
+        kept_criteria (list) : (duration, zones crossed, changes) tuples
+
+    Returns:
+        dominated (bool) : True if one of the kept tuples is lower or equal on every criterion
+    """
+
+    duration, zones, changes = criteria
+    for kept_duration, kept_zones, kept_changes in kept_criteria:
+        if kept_duration <= duration and kept_zones <= zones and kept_changes <= changes:
+            return True
+
+    return False
+
+
+def test_zones():
+    from network.path import PathFinder
+    from tube.map import TubeMap
+    tubemap = TubeMap()
+    tubemap.import_from_json("data/london.json")
+
+    path_finder = PathFinder(tubemap)
+
+    # Every station of the path is in the allowed zones
+    stations = path_finder.get_shortest_path_in_zones("Stockwell", "South Kensington", {1, 2})
+    assert [station.name for station in stations] == \
+        [station.name for station in path_finder.get_shortest_path("Stockwell", "South Kensington")]
+    assert path_finder.get_shortest_path_in_zones("Stockwell", "South Kensington", {1}) is None
+
+    journeys = path_finder.get_pareto_journeys("Stockwell", "South Kensington")
+    shortest_duration = path_finder.get_durations_from("Stockwell", ["South Kensington"])["South Kensington"]
+    assert journeys[0][0] == shortest_duration
+
+    # No journey dominates another one
+    criteria = [journey[:3] for journey in journeys]
+    for index, journey_criteria in enumerate(criteria):
+        assert not is_dominated(journey_criteria, criteria[:index] + criteria[index + 1:])
+
+    assert path_finder.get_pareto_journeys("Stockwell", "Nowhere") is None
+
+
+if __name__ == "__main__":
+    test_zones()
@@ -0,0 +1,359 @@
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import json
+from urllib.parse import parse_qs, urlsplit
+
+from main import get_tubemap
+from network.path import PathFinder
+
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                500: "Internal Server Error"}
+
+
+class JourneyService:
+    """ Local HTTP/JSON journey planning service, built on asyncio.
+
+    The service holds one TubeMap and one PathFinder. The searches run on a single worker thread, so that the event
+    loop keeps accepting and answering requests while a search runs (the PathFinder and its caches are only used by
+    that thread).
+
+    Concurrent queries share their work in two ways:
+    - coalescing: a query identical to one which is still waiting or being computed gets the same result, without
+      any new search
+    - micro-batching: the queries from the same starting station which arrive within `batch_window` seconds of
+      the first one, or while the worker thread is busy with other searches, are answered by a single
+      one-to-many search (see PathFinder.get_shortest_paths_from)
+
+    Endpoints:
+    - GET /journey?from=<station name>&to=<station name>: {"from", "to", "duration", "stations"} of ONE shortest
+      path (404 if a station does not exist or if there is no path)
+    - GET /stats: number of requests, of queries coalesced, of searches and of queries answered by the searches
+    """
+
+    def __init__(self, path_finder, batch_window=0.002):
+        """
+        Args:
+            path_finder (PathFinder) : PathFinder of the TubeMap used to answer the queries
+            batch_window (float) : time (in seconds) a query waits for other queries from the same station
+        """
+        self.path_finder = path_finder
+        self.batch_window = batch_window
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.worker_lock = asyncio.Lock()  # held while a search runs on the worker thread
+
+        self.pending = {}  # key: starting station name, value: dict {ending station name: Future} waiting for a search
+        self.in_flight = {}  # key: (starting station name, ending station name), value: Future of the journey
+        self.tasks = set()  # searches running (the event loop only keeps weak references to its tasks)
+
+        self.statistics = {"requests": 0, "coalesced": 0, "searches": 0, "searched_queries": 0}
+
+    async def get_journey(self, start_station_name, end_station_name):
+        """ Answers a journey query, sharing the search with the identical queries and the queries from the same
+                station made at the same time
+
+        Args:
+            start_station_name (str) : name of the starting station
+            end_station_name (str) : name of the ending station
+
+        Returns:
+            journey (tuple) : (duration, station names) of ONE shortest path, None if there is no path
+        """
+
+        key = (start_station_name, end_station_name)
+        future = self.in_flight.get(key)
+        if future is not None:
+            self.statistics["coalesced"] += 1
+            return await asyncio.shield(future)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.in_flight[key] = future
+
+        if start_station_name not in self.pending:
+            self.pending[start_station_name] = {}
+            task = asyncio.ensure_future(self.search(start_station_name))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+        self.pending[start_station_name][end_station_name] = future
+
+        return await asyncio.shield(future)
+
+    async def search(self, start_station_name):
+        """ Runs one search from a station on the worker thread and answers all the queries waiting for it
+
+        The queries from the station keep joining the batch until the worker thread is free to run its search.
+
+        Args:
+            start_station_name (str) : name of the starting station
+        """
+
+        loop = asyncio.get_running_loop()
+
+        await asyncio.sleep(self.batch_window)
+        async with self.worker_lock:
+            queries = self.pending.pop(start_station_name)
+            end_station_names = list(queries)
+
+            self.statistics["searches"] += 1
+            self.statistics["searched_queries"] += len(end_station_names)
+
+            try:
+                journeys = await loop.run_in_executor(self.executor, self.find_journeys, start_station_name,
+                                                      end_station_names)
+            except Exception as error:
+                for end_station_name, future in queries.items():
+                    del self.in_flight[(start_station_name, end_station_name)]
+                    future.set_exception(error)
+                return
+
+        for end_station_name, future in queries.items():
+            del self.in_flight[(start_station_name, end_station_name)]
+            future.set_result(journeys[end_station_name])
+
+    def find_journeys(self, start_station_name, end_station_names):
+        """ Finds the journeys from a station to several stations with one search (runs on the worker thread)
+
+        Args:
+            start_station_name (str) : name of the starting station
+            end_station_names (list) : names of the ending stations
+
+        Returns:
+            journeys (dict) : key: name of an ending station, value: (duration, station names) of ONE shortest path,
+                None if there is no path
+        """
+
+        paths = self.path_finder.get_shortest_paths_from(start_station_name, end_station_names)
+
+        journeys = {}
+        for end_station_name, stations in paths.items():
+            if stations is None:
+                journeys[end_station_name] = None
+                continue
+
+            duration = sum(self.path_finder.get_stations_pair_time(station_a.id, station_b.id)
+                           for station_a, station_b in zip(stations, stations[1:]))
+            journeys[end_station_name] = (duration, [station.name for station in stations])
+
+        return journeys
+
+    def get_station_name(self, station_name_given):
+        """ Finds the name of a station as written in the TubeMap (see tube.names)
+
+        Args:
+            station_name_given (str) : name of the station, possibly written differently
+
+        Returns:
+            name (str) : name of the station, None if it does not exist
+        """
+
+        if station_name_given in self.path_finder.tubemap.stations_by_name:
+            return station_name_given
+
+        return self.path_finder.tubemap.name_index.get_exact(station_name_given)
+
+    async def answer(self, method, target):
+        """ Answers an HTTP request, with a 400 response if the request is invalid and a 500 response if answering
+                it failed, so that the client always gets a response
+
+        Args:
+            method (str) : HTTP method
+            target (str) : path and query string of the request
+
+        Returns:
+            response (tuple) : (HTTP status code, JSON serialisable body)
+        """
+
+        self.statistics["requests"] += 1
+
+        try:
+            return await self.answer_request(method, target)
+        except (AssertionError, ValueError) as error:
+            # The checks of the TubeMap and the PathFinder on their inputs
+            return 400, {"error": f"Invalid request: {error}"}
+        except Exception as error:
+            return 500, {"error": f"Internal error: {type(error).__name__}"}
+
+    async def answer_request(self, method, target):
+        """ Answers an HTTP request, raising the errors met (see answer)
+
+        Args:
+            method (str) : HTTP method
+            target (str) : path and query string of the request
+
+        Returns:
+            response (tuple) : (HTTP status code, JSON serialisable body)
+        """
+
+        if method != "GET":
+            return 405, {"error": f"Method not allowed: {method}"}
+
+        url = urlsplit(target)
+        if url.path == "/stats":
+            return 200, dict(self.statistics)
+        if url.path != "/journey":
+            return 404, {"error": f"Unknown path: {url.path}"}
+
+        parameters = parse_qs(url.query)
+        if "from" not in parameters or "to" not in parameters:
+            return 400, {"error": "The 'from' and 'to' parameters are required"}
+
+        station_names = []
+        for station_name_given in (parameters["from"][0], parameters["to"][0]):
+            station_name = self.get_station_name(station_name_given)
+            if station_name is None:
+                return 404, {"error": f"Unknown station: {station_name_given}"}
+            station_names.append(station_name)
+
+        journey = await self.get_journey(*station_names)
+        if journey is None:
+            return 404, {"error": f"No path from {station_names[0]} to {station_names[1]}"}
+
+        duration, stations = journey
+        return 200, {"from": station_names[0], "to": station_names[1], "duration": duration, "stations": stations}
+
+    async def handle_connection(self, reader, writer):
+        """ Answers the HTTP/1.1 requests of a connection until the client closes it (keep-alive is supported)
+
+        Args:
+            reader (asyncio.StreamReader) : stream reading the requests
+            writer (asyncio.StreamWriter) : stream writing the responses
+        """
+
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                headers = {}
+                while True:
+                    header_line = await reader.readline()
+                    if header_line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header_line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                parts = request_line.decode("latin-1").split()
+                if len(parts) != 3:
+                    status, body = 400, {"error": "Malformed request line"}
+                else:
+                    status, body = await self.answer(parts[0], parts[1])
+
+                keep_alive = headers.get("connection", "").lower() != "close" and len(parts) == 3 and \
+                    parts[2] == "HTTP/1.1"
+
+                content = json.dumps(body).encode("utf-8")
+                writer.write((f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+                              f"Content-Type: application/json\r\n"
+                              f"Content-Length: {len(content)}\r\n"
+                              f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode("latin-1"))
+                writer.write(content)
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=8000):
+        """ Starts listening for HTTP requests
+
+        Args:
+            host (str) : address to listen on
+            port (int) : port to listen on (0 to pick a free port)
+
+        Returns:
+            server (asyncio.Server) : the server started
+        """
+
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    def close(self):
+        """ Shuts the worker thread down """
+        self.executor.shutdown()
+
+
+async def serve(host, port, batch_window):
+    """ Loads the tube map and runs the service until it is interrupted
+
+    Args:
+        host (str) : address to listen on
+        port (int) : port to listen on
+        batch_window (float) : time (in seconds) a query waits for other queries from the same station
+    """
+
+    service = JourneyService(PathFinder(get_tubemap()), batch_window)
+    service.path_finder.graph  # builds the graph before the first query
+
+    server = await service.start(host, port)
+    print(f"Serving journeys on http://{host}:{server.sockets[0].getsockname()[1]}/journey?from=...&to=...")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def test_service():
+    async def request(port, target):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n".encode("latin-1"))
+        response = await reader.read()
+        writer.close()
+        head, _, body = response.partition(b"\r\n\r\n")
+        return int(head.split()[1]), json.loads(body)
+
+    async def run():
+        service = JourneyService(PathFinder(get_tubemap()), batch_window=0.05)
+        server = await service.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+
+        targets = ["/journey?from=Covent+Garden&to=Green+Park", "/journey?from=Covent+Garden&to=Green+Park",
+                   "/journey?from=covent+garden&to=Holborn", "/journey?from=Covent+Garden&to=Nowhere"]
+        responses = await asyncio.gather(*[request(port, target) for target in targets])
+        statistics = (await request(port, "/stats"))[1]
+
+        # A search which fails gets an error response, the connection is not just closed
+        def fail(start_station_name, end_station_names):
+            raise RuntimeError("search failed")
+        service.path_finder.get_shortest_paths_from = fail
+        error_response = await request(port, "/journey?from=Holborn&to=Green+Park")
+        running_tasks = len(service.tasks)
+
+        server.close()
+        await server.wait_closed()
+        service.close()
+        return responses, statistics, error_response, running_tasks
+
+    responses, statistics, error_response, running_tasks = asyncio.run(run())
+
+    assert responses[0] == responses[1]
+    assert responses[0][0] == 200
+    assert responses[0][1]["stations"] == ["Covent Garden", "Leicester Square", "Piccadilly Circus", "Green Park"]
+    assert responses[2][1]["stations"] == ["Covent Garden", "Holborn"]
+    assert responses[3][0] == 404
+
+    # The identical queries are coalesced, and the queries from Covent Garden share one search
+    assert statistics["coalesced"] == 1
+    assert statistics["searches"] == 1 and statistics["searched_queries"] == 2
+
+    assert error_response == (500, {"error": "Internal error: RuntimeError"})
+    assert running_tasks == 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local HTTP/JSON journey planning service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--batch-window", type=float, default=0.002,
+                        help="time (in seconds) a query waits for other queries from the same station")
+    parser.add_argument("--test", action="store_true", help="run the self-test and exit")
+    arguments = parser.parse_args()
+
+    if arguments.test:
+        test_service()
+    else:
+        asyncio.run(serve(arguments.host, arguments.port, arguments.batch_window))
@@ -53,6 +53,70 @@ class Connection:
         return f"Connection({'<->'.join(station_names)}, {self.line.name}, {self.time})"
 
 
+# Memory-compact variants of the classes above, with the same public attributes.
+#
+# They have no per-instance __dict__ (__slots__), and are meant to be created through a TubeMap built with
+# compact=True, which interns the IDs and names and shares the frozensets of zones between stations.
+# The stations of a CompactConnection are a tuple: an empty frozenset already takes 216 bytes, four times the size
+# of a pair of stations in a tuple, and these sets were most of the memory of a TubeMap.
+
+
+class CompactStation:
+    __slots__ = ("id", "name", "zones")
+
+    def __init__(self, id, name, zones):
+        """ A memory-compact class representing a Tube station.
+
+        Args:
+            id (str) : Station ID
+            name (str) : Station name
+            zones (frozenset[int]) : Set of zone numbers for station.
+        """
+        self.id = id
+        self.name = name
+        self.zones = zones
+
+    def __repr__(self):
+        return f"Station({self.id}, {self.name}, {set(self.zones)})"
+
+
+class CompactLine:
+    __slots__ = ("id", "name")
+
+    def __init__(self, id, name):
+        """ A memory-compact class representing a Tube line.
+
+        Args:
+            id (str) : Line ID
+            name (str) : Line name
+        """
+        self.id = id
+        self.name = name
+
+    def __repr__(self):
+        return f"Line({self.id}, {self.name})"
+
+
+class CompactConnection:
+    __slots__ = ("stations", "line", "time")
+
+    def __init__(self, stations, line, time):
+        """ A memory-compact connection between two stations on a specific Tube line.
+
+        Args:
+            stations (tuple[CompactStation]) : stations associated with the connection, each of them once
+            line (CompactLine) : the line for the connection
+            time (int) : time needed (in minutes) to transit between the stations
+        """
+        self.stations = stations
+        self.line = line
+        self.time = time
+
+    def __repr__(self):
+        station_names = [station.name for station in self.stations]
+        return f"Connection({'<->'.join(station_names)}, {self.line.name}, {self.time})"
+
+
 if __name__ == '__main__':
     # Two Station instances
     station_1 = Station(id="99",
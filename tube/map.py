@@ -1,5 +1,19 @@
+from array import array
+from collections import deque
+import hashlib
 import json
+import os
+import struct
+import sys
+import tempfile
+from sys import intern
 from tube.components import *
+from tube.names import StationNameIndex
+from tube.stream import JSONRecordReader
+
+SNAPSHOT_MAGIC = b"TMAP"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct("<4sH32sIII")  # magic, version, checksum of the source, stations, lines, connections
 
 
 class TubeMap:
@@ -13,14 +27,54 @@ class TubeMap:
     - stations: a dictionary that indexes Station instances by their id (key=id (str), value=Station)
     - lines: a dictionary that indexes Line instances by their id (key=id, value=Line)
     - connections: a list of Connection instances for the TubeMap (list of Connections)
+
+    The Station instances are also indexed by their name in `stations_by_name` (key=name (str), value=Station),
+    so that stations can be looked up by id or by name in constant time.
+
+    The station names are also indexed in `name_index` (see tube.names), which answers lookups of names written
+    differently (case, punctuation, "St"/"Street"), of prefixes and of misspelt names. The index is only built on
+    its first use, so that it does not slow the imports down.
+
+    The coordinates of the stations are kept in `coordinates` (key=id (str), value=(latitude, longitude)), for the
+    stations whose JSON record provides them.
+
+    With compact=True, the stations, lines and connections are built with the memory-compact classes of
+    tube.components: the IDs and names are interned, the frozensets of zones are shared by all the stations having
+    the same ones, and the stations of a connection are kept in a tuple instead of a set. On the London network,
+    this takes the memory of a TubeMap from about 320 KB to about 160 KB.
+
+    Connections can be closed, reopened or delayed after the import (close_connection, reopen_connection and
+    set_connection_time). These edits are recorded in `edits`, so that the structures derived from the TubeMap
+    (such as its graph, see network.graph) can be updated instead of being rebuilt.
     """
 
-    def __init__(self):
+    def __init__(self, compact=False):
         self.stations = {}  # key: id (str), value: Station instance
+        self.stations_by_name = {}  # key: name (str), value: Station instance
+        self.names = None  # (number of stations, StationNameIndex), see name_index
+        self.coordinates = {}  # key: id (str), value: (latitude, longitude) in degrees
         self.lines = {}  # key: id (str), value: Line instance
         self.connections = []  # list of Connection instances
         self.validity = True
+        self.version = 0  # incremented every time a station, line or connection is added or edited
+        self.closed_connections = []  # list of the Connection instances closed by close_connection
+        self.edits = deque(maxlen=1000)  # last edits of connections: (version after the edit, action, Connection)
+
+        self.compact = compact
+        self.shared_frozensets = {}  # key and value: frozenset of zones (compact TubeMap only)
+
+    @property
+    def name_index(self):
+        """ StationNameIndex : index of the station names (see tube.names), built on the first lookup and built
+                again when stations have been added since (stations are never removed nor renamed) """
 
+        if self.names is None or self.names[0] != len(self.stations_by_name):
+            name_index = StationNameIndex()
+            for name in self.stations_by_name:
+                name_index.add(name)
+            self.names = (len(self.stations_by_name), name_index)
+
+        return self.names[1]
 
     def import_from_json(self, filepath):
         """ Import tube map information from a JSON file.
@@ -72,6 +126,285 @@ class TubeMap:
         except AssertionError and KeyError:
             return None
 
+    def import_from_json_stream(self, source, chunk_size=1 << 16):
+        """ Import tube map information from a JSON file, reading and validating it record by record.
+
+        Unlike import_from_json, the whole document is never loaded in memory: each station, line and connection is
+        decoded, validated and added on its own (see tube.stream). The connections need their stations and lines,
+        so when the "connections" section comes first in the document:
+        - if the source can be read again (a path or a seekable file), the connections are skipped and read in a
+          second pass over the file
+        - otherwise, the connections met too early are kept aside as compact tuples until their stations and lines
+          have been added
+
+        Args:
+            source (str or file) : path to the JSON file, or text file-like object to read it from.
+                If the path is invalid, no attribute should be updated, and no error should be raised.
+            chunk_size (int) : number of characters read from the file at once
+        """
+
+        try:
+            jsonfile = open(source, "r") if isinstance(source, str) else source
+        except FileNotFoundError:
+            self.validity = False
+            return None
+
+        try:
+            seekable = jsonfile.seekable()
+            start_position = jsonfile.tell() if seekable else None
+
+            completed_sections = set()
+            current_section = None
+            pending_connections = []  # connections met before their stations and lines (non-seekable sources)
+            second_pass = False
+
+            for section, record in JSONRecordReader(jsonfile, chunk_size):
+                if section != current_section:
+                    completed_sections.add(current_section)
+                    current_section = section
+
+                if section == 'stations':
+                    self.add_station_to_dict([record], 0)
+                elif section == 'lines':
+                    self.add_line_to_dict([record], 0)
+                elif section == 'connections':
+                    if 'stations' in completed_sections and 'lines' in completed_sections:
+                        self.add_connection_to_list([record], 0)
+                    elif seekable:
+                        second_pass = True
+                    else:
+                        pending_connections.append(tuple(record.items()))
+
+            for record in pending_connections:
+                self.add_connection_to_list([dict(record)], 0)
+
+            if second_pass:
+                jsonfile.seek(start_position)
+                for section, record in JSONRecordReader(jsonfile, chunk_size):
+                    if section == 'connections':
+                        self.add_connection_to_list([record], 0)
+        except (AssertionError, KeyError):
+            return None
+        finally:
+            if isinstance(source, str):
+                jsonfile.close()
+
+    def import_with_snapshot(self, filepath, snapshot_filepath):
+        """ Import tube map information from a JSON file, going through a binary snapshot of it.
+
+        When the snapshot exists and was exported from the current content of the JSON file, it is imported
+        instead of the JSON file. Otherwise, the JSON file is imported and the snapshot is (re)written, if its
+        directory is writable.
+
+        Args:
+            filepath (str) : path to the JSON file containing the tube map
+            snapshot_filepath (str) : path to the snapshot of the JSON file
+        """
+
+        try:
+            checksum = get_checksum(filepath)
+        except FileNotFoundError:
+            self.validity = False
+            return None
+
+        if self.import_snapshot(snapshot_filepath, checksum):
+            return None
+
+        self.import_from_json(filepath)
+        if self.validity:
+            # The snapshot only speeds the next imports up: the TubeMap is kept if it cannot be written
+            try:
+                self.export_snapshot(snapshot_filepath, checksum)
+            except OSError:
+                pass
+
+    def export_snapshot(self, filepath, checksum=bytes(32)):
+        """ Writes the stations, lines and connections to a versioned binary snapshot.
+
+        The snapshot is made of a header followed by:
+        - all the strings (ids and names of the stations and lines), joined by null characters
+        - the number of zones of each station (unsigned bytes) and all the zones (16 bits integers)
+        - for each station, whether its coordinates are known (unsigned byte), and all the coordinates (doubles)
+        - for each connection, the position of both stations, the position of the line and the time
+          (32 bits integers)
+        All the numbers are stored in little-endian order, and every section is prefixed by its size in bytes.
+
+        The snapshot is written to a temporary file in the same directory, which then replaces the snapshot at once:
+        a process importing the snapshot at the same time reads either the previous snapshot or the new one.
+
+        Args:
+            filepath (str) : path of the snapshot to write
+            checksum (bytes) : SHA-256 checksum of the JSON file the TubeMap was imported from (see get_checksum)
+        """
+
+        station_positions = {station: position for position, station in enumerate(self.stations)}
+        line_positions = {line: position for position, line in enumerate(self.lines)}
+
+        strings = []
+        zone_counts = array("B")
+        zones = array("h")
+        coordinate_flags = array("B")
+        coordinates = array("d")
+        for station_obj in self.stations.values():
+            strings.extend((station_obj.id, station_obj.name))
+            zone_counts.append(len(station_obj.zones))
+            zones.extend(sorted(station_obj.zones))
+            if station_obj.id in self.coordinates:
+                coordinate_flags.append(1)
+                coordinates.extend(self.coordinates[station_obj.id])
+            else:
+                coordinate_flags.append(0)
+
+        for line_obj in self.lines.values():
+            strings.extend((line_obj.id, line_obj.name))
+
+        connections = array("i")
+        for connection_obj in self.connections:
+            station_objs = list(connection_obj.stations)
+            connections.extend((station_positions[station_objs[0].id], station_positions[station_objs[-1].id],
+                                line_positions[connection_obj.line.id], connection_obj.time))
+
+        sections = ["\0".join(strings).encode("utf-8")]
+        for section in (zone_counts, zones, coordinate_flags, coordinates, connections):
+            if sys.byteorder == "big":
+                section.byteswap()
+            sections.append(section.tobytes())
+
+        descriptor, temporary_filepath = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(filepath)),
+                                                          prefix=os.path.basename(filepath), suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as snapshotfile:
+                snapshotfile.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, checksum,
+                                                        len(self.stations), len(self.lines), len(self.connections)))
+                for section in sections:
+                    snapshotfile.write(struct.pack("<Q", len(section)))
+                    snapshotfile.write(section)
+            os.replace(temporary_filepath, filepath)
+        except BaseException:
+            os.remove(temporary_filepath)
+            raise
+
+    def import_snapshot(self, filepath, checksum=None):
+        """ Import tube map information from a binary snapshot written by export_snapshot.
+
+        The records are not validated again: they were validated when the JSON file was imported.
+
+        Args:
+            filepath (str) : path of the snapshot to read
+            checksum (bytes) : if given, the snapshot is only imported if it was exported from a JSON file
+                with this checksum
+
+        Returns:
+            imported (bool) : True if the snapshot has been imported, False if it is missing or unreadable,
+                outdated, from another version of the format, truncated or corrupt (no attribute is updated in that
+                case)
+        """
+
+        try:
+            with open(filepath, "rb") as snapshotfile:
+                content = snapshotfile.read()
+        except OSError:
+            return False
+
+        if len(content) < SNAPSHOT_HEADER.size:
+            return False
+
+        magic, version, snapshot_checksum, n_stations, n_lines, n_connections = \
+            SNAPSHOT_HEADER.unpack_from(content)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            return False
+        if checksum is not None and checksum != snapshot_checksum:
+            return False
+
+        sections = read_snapshot_sections(content, n_stations, n_lines, n_connections)
+        if sections is None:
+            return False
+        strings, zone_counts, zones, coordinate_flags, coordinates, connections = sections
+
+        station_objs = []
+        zone_position = 0
+        coordinate_position = 0
+        for position in range(n_stations):
+            identity, name = strings[2 * position], strings[2 * position + 1]
+            station_zones = set(zones[zone_position:zone_position + zone_counts[position]])
+            zone_position += zone_counts[position]
+
+            station_obj = self.create_station(identity, name, station_zones)
+            station_objs.append(station_obj)
+            self.stations[identity] = station_obj
+            self.stations_by_name[name] = station_obj
+
+            if coordinate_flags[position]:
+                self.coordinates[identity] = (coordinates[coordinate_position], coordinates[coordinate_position + 1])
+                coordinate_position += 2
+
+        line_objs = []
+        for position in range(n_stations, n_stations + n_lines):
+            line_obj = self.create_line(strings[2 * position], strings[2 * position + 1])
+            line_objs.append(line_obj)
+            self.lines[line_obj.id] = line_obj
+
+        for position in range(0, 4 * n_connections, 4):
+            stations = {station_objs[connections[position]], station_objs[connections[position + 1]]}
+            self.connections.append(self.create_connection(stations, line_objs[connections[position + 2]],
+                                                           connections[position + 3]))
+
+        self.version += n_stations + n_lines + n_connections
+        return True
+
+    def create_station(self, identity, name, zones):
+        """ Creates a Station, or a CompactStation for a compact TubeMap
+
+        Args:
+            identity (str) : Station ID
+            name (str) : Station name
+            zones (set[int]) : Set of zone numbers for station
+
+        Returns:
+            station (Station or CompactStation) : the new station
+        """
+
+        if not self.compact:
+            return Station(identity, name, zones)
+
+        zones = self.shared_frozensets.setdefault(frozenset(zones), frozenset(zones))
+        return CompactStation(intern(identity), intern(name), zones)
+
+    def create_line(self, identity, name):
+        """ Creates a Line, or a CompactLine for a compact TubeMap
+
+        Args:
+            identity (str) : Line ID
+            name (str) : Line name
+
+        Returns:
+            line (Line or CompactLine) : the new line
+        """
+
+        if not self.compact:
+            return Line(identity, name)
+
+        return CompactLine(intern(identity), intern(name))
+
+    def create_connection(self, stations, line, time):
+        """ Creates a Connection, or a CompactConnection for a compact TubeMap
+
+        Args:
+            stations (set) : stations associated with the connection
+            line (Line or CompactLine) : the line for the connection
+            time (int) : time needed (in minutes) to transit between the stations
+
+        Returns:
+            connection (Connection or CompactConnection) : the new connection
+        """
+
+        if not self.compact:
+            return Connection(stations, line, time)
+
+        # Not shared between the connections of the same stations: most pairs of stations have a single connection,
+        # and the dict needed to share them would take more memory than the tuples
+        return CompactConnection(tuple(set(stations)), line, time)
+
     def add_line_to_dict(self, lines, index):
         """ Adds a Line object to the dict self.lines
 
@@ -89,7 +422,8 @@ class TubeMap:
         assert (type(identity) == str and
                 type(name) == str), "Wrong data types for the Line class"
 
-        self.lines[identity] = Line(identity, name)
+        self.lines[identity] = self.create_line(identity, name)
+        self.version += 1
 
     def add_station_to_dict(self, stations, index):
         """ Adds a Station object to the dict self.stations
@@ -137,7 +471,15 @@ class TubeMap:
                 type(zones) == set and
                 condition_int), "Wrong data type for the Station class"
 
-        self.stations[identity] = Station(identity, name, zones)
+        station = self.create_station(identity, name, zones)
+        self.stations[identity] = station
+        self.stations_by_name[name] = station
+
+        # The coordinates are optional, they are only used to guide the search for shortest paths
+        if 'latitude' in stations[index] and 'longitude' in stations[index]:
+            self.coordinates[identity] = (float(stations[index]['latitude']),
+                                          float(stations[index]['longitude']))
+        self.version += 1
 
     def add_connection_to_list(self, connections, index):
         """ Adds a Connection object to the list self.connections
@@ -162,7 +504,136 @@ class TubeMap:
 
         time = int(connections[index]['time'])
 
-        self.connections.append(Connection(stations, line, time))
+        self.connections.append(self.create_connection(stations, line, time))
+        self.version += 1
+
+    def close_connection(self, connection):
+        """ Removes a Connection from self.connections, until it is reopened (for instance during a line closure)
+
+        Args:
+            connection (Connection) : connection of the TubeMap to close
+        """
+
+        assert connection in self.connections, "The connection is not an open connection of the TubeMap"
+
+        self.connections.remove(connection)
+        self.closed_connections.append(connection)
+        self.record_edit("close", connection)
+
+    def reopen_connection(self, connection):
+        """ Adds back a Connection closed by close_connection
+
+        Args:
+            connection (Connection) : closed connection of the TubeMap to reopen
+        """
+
+        assert connection in self.closed_connections, "The connection is not a closed connection of the TubeMap"
+
+        self.closed_connections.remove(connection)
+        self.connections.append(connection)
+        self.record_edit("reopen", connection)
+
+    def set_connection_time(self, connection, time):
+        """ Changes the time needed to transit through a Connection (for instance after a delay)
+
+        Args:
+            connection (Connection) : connection of the TubeMap (open or closed)
+            time (int) : new time (in minutes) of the connection
+        """
+
+        assert connection in self.connections or connection in self.closed_connections, \
+            "The connection is not a connection of the TubeMap"
+        assert type(time) == int and time >= 0, "The time of a connection must be a non-negative int"
+
+        connection.time = time
+        self.record_edit("time", connection)
+
+    def record_edit(self, action, connection):
+        """ Bumps the version of the TubeMap and records the edit of a connection
+
+        Args:
+            action (str) : "close", "reopen" or "time"
+            connection (Connection) : connection edited
+        """
+
+        self.version += 1
+        self.edits.append((self.version, action, connection))
+
+
+def read_snapshot_sections(content, n_stations, n_lines, n_connections):
+    """ Reads the sections of a snapshot (see TubeMap.export_snapshot), checking that they are complete and
+            consistent with the numbers of stations, lines and connections of its header
+
+    Args:
+        content (bytes) : content of the snapshot file
+        n_stations (int) : number of stations in the header
+        n_lines (int) : number of lines in the header
+        n_connections (int) : number of connections in the header
+
+    Returns:
+        sections (tuple) : (strings, zone_counts, zones, coordinate_flags, coordinates, connections),
+            None if the snapshot is truncated or corrupt
+    """
+
+    sections = []
+    position = SNAPSHOT_HEADER.size
+    for typecode in (None, "B", "h", "B", "d", "i"):
+        if position + 8 > len(content):
+            return None
+        size, = struct.unpack_from("<Q", content, position)
+        position += 8
+        if position + size > len(content):
+            return None
+
+        if typecode is None:
+            try:
+                section = content[position:position + size].decode("utf-8").split("\0")
+            except UnicodeDecodeError:
+                return None
+        else:
+            section = array(typecode)
+            if size % section.itemsize != 0:
+                return None
+            section.frombytes(content[position:position + size])
+            if sys.byteorder == "big":
+                section.byteswap()
+
+        sections.append(section)
+        position += size
+
+    if position != len(content):
+        return None
+
+    strings, zone_counts, zones, coordinate_flags, coordinates, connections = sections
+    if (len(strings) != 2 * (n_stations + n_lines) or len(zone_counts) != n_stations or
+            len(zones) != sum(zone_counts) or len(coordinate_flags) != n_stations or
+            len(coordinates) != 2 * sum(coordinate_flags) or len(connections) != 4 * n_connections):
+        return None
+
+    for position in range(0, 4 * n_connections, 4):
+        if not (0 <= connections[position] < n_stations and 0 <= connections[position + 1] < n_stations and
+                0 <= connections[position + 2] < n_lines):
+            return None
+
+    return tuple(sections)
+
+
+def get_checksum(filepath):
+    """ Computes the SHA-256 checksum of a file, used to know whether a snapshot is up to date
+
+    Args:
+        filepath (str) : path of the file
+
+    Returns:
+        checksum (bytes) : SHA-256 digest of the content of the file
+    """
+
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as sourcefile:
+        for block in iter(lambda: sourcefile.read(1 << 20), b""):
+            digest.update(block)
+
+    return digest.digest()
 
 
 def test_import():
@@ -184,5 +655,116 @@ def test_import():
     print(tubemap.connections)
 
 
+def test_snapshot():
+    import os
+    import tempfile
+    tubemap = TubeMap()
+    tubemap.import_from_json("data/london.json")
+
+    filepath = os.path.join(tempfile.mkdtemp(), "london.tubemap")
+    tubemap.export_snapshot(filepath, get_checksum("data/london.json"))
+
+    snapshot_tubemap = TubeMap()
+    assert snapshot_tubemap.import_snapshot(filepath, get_checksum("data/london.json"))
+
+    assert repr(snapshot_tubemap.stations) == repr(tubemap.stations)
+    assert repr(snapshot_tubemap.lines) == repr(tubemap.lines)
+    assert len(snapshot_tubemap.connections) == len(tubemap.connections)
+    assert snapshot_tubemap.coordinates == tubemap.coordinates
+    assert os.listdir(os.path.dirname(filepath)) == ["london.tubemap"]
+
+    # Truncated or corrupt snapshots are not imported
+    with open(filepath, "rb") as snapshotfile:
+        content = snapshotfile.read()
+    for size in (SNAPSHOT_HEADER.size + 4, 200, len(content) // 3, len(content) - 1):
+        with open(filepath, "wb") as snapshotfile:
+            snapshotfile.write(content[:size])
+        truncated_tubemap = TubeMap()
+        assert not truncated_tubemap.import_snapshot(filepath)
+        assert truncated_tubemap.stations == {} and truncated_tubemap.version == 0
+
+    # The JSON file is still imported when the snapshot cannot be written
+    unwritable_tubemap = TubeMap()
+    unwritable_tubemap.import_with_snapshot("data/london.json", os.path.join(filepath, "missing", "london.tubemap"))
+    assert len(unwritable_tubemap.stations) == len(tubemap.stations)
+
+
+def test_import_stream():
+    import io
+
+    class NonSeekableFile:
+        # Text file which can only be read forwards, like a pipe or a network stream
+        def __init__(self, content):
+            self.fileobj = io.StringIO(content)
+
+        def read(self, size=-1):
+            return self.fileobj.read(size)
+
+        def seekable(self):
+            return False
+
+    def get_connections(tubemap):
+        # The stations of a connection are a set, compared by ID
+        return [(sorted(station.id for station in connection.stations), connection.line.id, connection.time)
+                for connection in tubemap.connections]
+
+    tubemap = TubeMap()
+    tubemap.import_from_json("data/london.json")
+
+    with open("data/london.json", "r") as jsonfile:
+        content = jsonfile.read()
+
+    # The "connections" section comes first in data/london.json: a path and a seekable file are read twice, the
+    # connections of a non-seekable file are kept aside until the stations and the lines have been added
+    for source in ("data/london.json", io.StringIO(content), NonSeekableFile(content)):
+        stream_tubemap = TubeMap()
+        stream_tubemap.import_from_json_stream(source, chunk_size=4096)
+
+        assert repr(stream_tubemap.stations) == repr(tubemap.stations)
+        assert repr(stream_tubemap.lines) == repr(tubemap.lines)
+        assert get_connections(stream_tubemap) == get_connections(tubemap)
+        assert stream_tubemap.coordinates == tubemap.coordinates
+
+
+def test_compact():
+    import os
+    import tempfile
+    from network.path import PathFinder
+    from tube.components import CompactConnection, CompactStation
+    # The graph builder expects tube.map.TubeMap, not the TubeMap of __main__ when this file is run
+    from tube.map import TubeMap
+
+    tubemap = TubeMap()
+    tubemap.import_from_json("data/london.json")
+    path_finder = PathFinder(tubemap)
+
+    filepath = os.path.join(tempfile.mkdtemp(), "london.tubemap")
+    tubemap.export_snapshot(filepath)
+
+    json_tubemap = TubeMap(compact=True)
+    json_tubemap.import_from_json("data/london.json")
+    snapshot_tubemap = TubeMap(compact=True)
+    assert snapshot_tubemap.import_snapshot(filepath)
+
+    names = sorted(tubemap.stations_by_name)
+    for compact_tubemap in (json_tubemap, snapshot_tubemap):
+        assert all(type(station) == CompactStation for station in compact_tubemap.stations.values())
+        assert all(type(connection) == CompactConnection for connection in compact_tubemap.connections)
+        assert [sorted(station.id for station in connection.stations) for connection in compact_tubemap.connections] \
+            == [sorted(station.id for station in connection.stations) for connection in tubemap.connections]
+
+        # A compact TubeMap routes like the default one
+        compact_path_finder = PathFinder(compact_tubemap)
+        for start_station_name in names[::20]:
+            paths = path_finder.get_shortest_paths_from(start_station_name, names)
+            compact_paths = compact_path_finder.get_shortest_paths_from(start_station_name, names)
+            for end_station_name in names:
+                assert [station.name for station in compact_paths[end_station_name]] == \
+                    [station.name for station in paths[end_station_name]]
+
+
 if __name__ == "__main__":
     test_import()
+    test_snapshot()
+    test_import_stream()
+    test_compact()
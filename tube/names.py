@@ -0,0 +1,217 @@
+from bisect import bisect_left
+import unicodedata
+
+# Words written in several ways in station names, replaced by a single spelling when normalising
+WORD_SPELLINGS = {"street": "st", "saint": "st", "and": "&"}
+
+
+def normalise_name(name):
+    """ Normalises a station name for lookups: lower case, no accents nor punctuation, and a single spelling for
+            "St"/"Street"/"Saint" and "&"/"and".
+
+    For instance, "St. James's Park" becomes "st jamess park" and "Baker Street" becomes "baker st".
+
+    Args:
+        name (str) : station name, or part of a station name
+
+    Returns:
+        normalised_name (str) : words of the normalised name, separated by single spaces
+    """
+
+    name = unicodedata.normalize("NFKD", name.lower())
+    name = "".join(character for character in name if not unicodedata.combining(character))
+    name = name.replace("'", "").replace("’", "").replace("&", " & ")
+
+    words = "".join(character if character.isalnum() or character == "&" else " " for character in name).split()
+    return " ".join(WORD_SPELLINGS.get(word, word) for word in words)
+
+
+def get_trigrams(normalised_name):
+    """ Computes the set of trigrams (sequences of three characters) of a normalised name, padded with spaces
+
+    Args:
+        normalised_name (str) : normalised name (see normalise_name)
+
+    Returns:
+        trigrams (set) : trigrams of the name
+    """
+
+    padded_name = f"  {normalised_name} "
+    return {padded_name[position:position + 3] for position in range(len(padded_name) - 2)}
+
+
+class StationNameIndex:
+    """ Index of the station names of a TubeMap, answering exact, prefix and fuzzy lookups.
+
+    The names are normalised (see normalise_name) and indexed in two structures:
+    - prefixes: sorted list of (normalised name from one of its words, position of the word, name), so that the
+      names having a word starting with a prefix are next to each other and found by binary search
+    - trigrams: key: trigram, value: names whose normalised name contains it, used to find names close to a
+      misspelt query (Dice coefficient of the sets of trigrams)
+
+    Names are added one at a time while the TubeMap is imported; the list of prefixes is sorted again on the first
+    lookup after new names have been added.
+    """
+
+    def __init__(self):
+        self.names = {}  # key: normalised name, value: list of the names having this normalised name
+        self.prefixes = []  # (normalised name from one of its words, position of the word, name)
+        self.sorted = True  # whether the prefixes are sorted
+        self.trigrams = {}  # key: trigram, value: list of names
+        self.trigram_counts = {}  # key: name, value: number of trigrams of its normalised name
+
+    def add(self, name):
+        """ Adds a station name to the index (names already in the index are ignored)
+
+        Args:
+            name (str) : station name
+        """
+
+        if name in self.trigram_counts:
+            return
+
+        normalised_name = normalise_name(name)
+        self.names.setdefault(normalised_name, []).append(name)
+
+        words = normalised_name.split(" ")
+        for position in range(len(words)):
+            self.prefixes.append((" ".join(words[position:]), position, name))
+        self.sorted = False
+
+        trigrams = get_trigrams(normalised_name)
+        for trigram in trigrams:
+            self.trigrams.setdefault(trigram, []).append(name)
+        self.trigram_counts[name] = len(trigrams)
+
+    def get_exact(self, query):
+        """ Finds the station name matching a query once both are normalised
+
+        Args:
+            query (str) : station name, for instance "baker st" or "St Jamess Park"
+
+        Returns:
+            name (str) : matching station name, None if there is none or if several names match
+        """
+
+        names = self.names.get(normalise_name(query), [])
+        if len(names) != 1:
+            return None
+
+        return names[0]
+
+    def get_prefix_matches(self, prefix, limit=10):
+        """ Finds the station names having a word starting with a prefix (for instance, to autocomplete a query)
+
+        Args:
+            prefix (str) : beginning of a station name, or of one of its words
+            limit (int) : maximum number of names returned
+
+        Returns:
+            names (list) : matching station names, the ones starting with the prefix first, then in alphabetical
+                order of the matching words
+        """
+
+        if not self.sorted:
+            self.prefixes.sort()
+            self.sorted = True
+
+        normalised_prefix = normalise_name(prefix)
+        if normalised_prefix == "":
+            return []
+
+        starting_names = []
+        other_names = []
+        position = bisect_left(self.prefixes, (normalised_prefix,))
+        while position < len(self.prefixes) and self.prefixes[position][0].startswith(normalised_prefix):
+            words, word_position, name = self.prefixes[position]
+            if word_position == 0:
+                starting_names.append(name)
+            else:
+                other_names.append(name)
+            position += 1
+
+        names = []
+        for name in starting_names + other_names:
+            if name not in names:
+                names.append(name)
+                if len(names) == limit:
+                    break
+
+        return names
+
+    def get_fuzzy_matches(self, query, limit=5, min_similarity=0.4):
+        """ Finds the station names closest to a query, which may be misspelt
+
+        Args:
+            query (str) : station name, possibly misspelt
+            limit (int) : maximum number of names returned
+            min_similarity (float) : minimum similarity (Dice coefficient of the sets of trigrams, between 0 and 1)
+                of the names returned
+
+        Returns:
+            matches (list) : (similarity, name) of the closest station names, the most similar first
+        """
+
+        query_trigrams = get_trigrams(normalise_name(query))
+
+        shared_counts = {}  # key: name, value: number of trigrams shared with the query
+        for trigram in query_trigrams:
+            for name in self.trigrams.get(trigram, ()):
+                shared_counts[name] = shared_counts.get(name, 0) + 1
+
+        matches = []
+        for name, shared_count in shared_counts.items():
+            similarity = 2 * shared_count / (len(query_trigrams) + self.trigram_counts[name])
+            if similarity >= min_similarity:
+                matches.append((similarity, name))
+
+        matches.sort(key=lambda match: (-match[0], match[1]))
+        return matches[:limit]
+
+    def resolve(self, query):
+        """ Finds the station name a query most likely refers to: the normalised exact match, otherwise the only
+                name starting with the query, otherwise the closest name
+
+        Args:
+            query (str) : station name, possibly partial, differently written or misspelt
+
+        Returns:
+            name (str) : station name, None if no name is close enough to the query
+        """
+
+        name = self.get_exact(query)
+        if name is not None:
+            return name
+
+        names = self.get_prefix_matches(query, limit=2)
+        if len(names) == 1:
+            return names[0]
+
+        matches = self.get_fuzzy_matches(query, limit=1)
+        if len(matches) == 0:
+            return None
+
+        return matches[0][1]
+
+
+def test_names():
+    from tube.map import TubeMap
+    tubemap = TubeMap()
+    tubemap.import_from_json("data/london.json")
+
+    name_index = tubemap.name_index
+    assert name_index.get_exact("st jamess park") == "St. James's Park"
+    assert name_index.get_exact("BAKER STREET") == "Baker Street"
+    assert name_index.get_exact("Baker St") == "Baker Street"
+
+    assert name_index.get_prefix_matches("covent") == ["Covent Garden"]
+    assert "South Kensington" in name_index.get_prefix_matches("kensington")
+    assert name_index.get_prefix_matches("") == []
+
+    assert name_index.get_fuzzy_matches("Picadilly Circus")[0][1] == "Piccadilly Circus"
+    assert name_index.resolve("Green Prak") == "Green Park"
+    assert name_index.resolve("xyzzy") is None
+
+
+if __name__ == "__main__":
+    test_names()
@@ -0,0 +1,149 @@
+import json
+
+WHITESPACE = " \t\n\r"
+
+
+class JSONRecordReader:
+    """ Reads the records of a JSON document of the form {"section": [record, record, ...], ...} one at a time.
+
+    The file is read by chunks, and only the records being decoded are kept in memory, so that very large files
+    can be imported without loading the whole document. Each record is decoded with the standard `json` decoder.
+    Top-level values which are not lists are decoded and skipped.
+    """
+
+    def __init__(self, fileobj, chunk_size=1 << 16):
+        """
+        Args:
+            fileobj (file) : text file-like object to read the document from
+            chunk_size (int) : number of characters read at once
+        """
+        self.fileobj = fileobj
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.position = 0  # position of the next character to read in the buffer
+        self.eof = False
+
+    def __iter__(self):
+        """ Yields (section name, record) for each record of each section, in the order of the document """
+
+        self.expect("{")
+        if self.peek() == "}":
+            return
+
+        while True:
+            section = self.decode_value()
+            if type(section) != str:
+                raise ValueError("Invalid JSON document: expected a section name")
+            self.expect(":")
+
+            if self.peek() == "[":
+                self.position += 1
+                if self.peek() == "]":
+                    self.position += 1
+                else:
+                    while True:
+                        yield section, self.decode_value()
+                        if self.next_character(",]") == "]":
+                            break
+            else:
+                self.decode_value()
+
+            if self.next_character(",}") == "}":
+                return
+
+    def fill(self):
+        """ Reads the next chunk of the file, dropping the characters already read from the buffer
+
+        Returns:
+            filled (bool) : False if the end of the file has been reached
+        """
+
+        if self.eof:
+            return False
+
+        chunk = self.fileobj.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
+
+    def peek(self):
+        """ Skips the whitespace and returns the next character, without consuming it
+
+        Returns:
+            character (str) : next character of the document
+        """
+
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in WHITESPACE:
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.fill():
+                raise ValueError("Invalid JSON document: unexpected end of file")
+
+    def expect(self, character):
+        """ Consumes the next character, which must be the given one
+
+        Args:
+            character (str) : expected character
+        """
+        self.next_character(character)
+
+    def next_character(self, allowed_characters):
+        """ Consumes the next character, which must be one of the allowed characters
+
+        Args:
+            allowed_characters (str) : characters allowed at this point of the document
+
+        Returns:
+            character (str) : the character consumed
+        """
+
+        character = self.peek()
+        if character not in allowed_characters:
+            raise ValueError(f"Invalid JSON document: expected one of {allowed_characters!r}, got {character!r}")
+
+        self.position += 1
+        return character
+
+    def decode_value(self):
+        """ Decodes the next JSON value, reading more of the file until the value is complete
+
+        Returns:
+            value : the decoded value
+        """
+
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                # The value may be cut by the end of the buffer
+                if self.fill():
+                    continue
+                raise
+
+            # A number at the very end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and self.fill():
+                continue
+
+            self.position = end
+            return value
+
+
+def test_stream():
+    import io
+    document = '{"connections": [{"station1": "1", "time": 12}], "name": "test", "stations": [], "lines": [1, 2]}'
+
+    records = list(JSONRecordReader(io.StringIO(document), chunk_size=3))
+
+    assert records == [("connections", {"station1": "1", "time": 12}), ("lines", 1), ("lines", 2)]
+
+
+if __name__ == "__main__":
+    test_stream()